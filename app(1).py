@@ -1,9 +1,21 @@
+import math
 import streamlit as st
-import numpy as np
-import joblib
+from metrics import get_metrics
+from model_registry import get_registry_provider
+from prediction_cache import cached_score
+from ui_components import (
+    audit_prediction, check_drift, render_batch_section, render_cache_stats, render_drift_panel, render_explanation,
+    render_metrics_panel,
+)
+
+# Stage timings of this rerun (metrics.py); a cProfile capture runs when it
+# was requested from the sidebar
+metrics = get_metrics()
+metrics.begin_rerun(profile=st.session_state.pop('profile_next_rerun', False))
 
-# Load the saved model
-model = joblib.load('best_model.pkl')
+# Load the registry's active model once per process; it is swapped
+# automatically when another version is published or activated
+model_provider = get_registry_provider('model')
 
 # Set custom page configuration
 st.set_page_config(
@@ -80,41 +92,55 @@ st.markdown("---")
 st.header("🔬 Input the Tumor Measurements:")
 st.write("Please provide the following tissue impedance feature values for analysis.")
 
+# Raw measurements can be entered when the active version has a folded
+# model, which applies I0_log and the feature scaling itself
+folded_provider = get_registry_provider('folded')
+raw_input = folded_provider.exists() and st.checkbox(
+    "Enter raw measurements (as in data.csv)", help="I0_log and feature scaling are applied automatically"
+)
+input_limit = 100000.0 if raw_input else 1000.0
+
 # Organize the inputs in a more spacious layout using three columns
 col1, col2, col3 = st.columns(3)
 
 with col1:
-    I0 = st.number_input('I0 (Impedance at 0 Hz)', min_value=-1000.0, max_value=1000.0, value=0.09, help="Impedance at 0 Hz")
-    PA500 = st.number_input('PA500 (Phase Angle at 500 Hz)', min_value=-1000.0, max_value=1000.0, value=-0.07, help="Phase Angle at 500 Hz")
+    I0 = st.number_input('I0 (Impedance at 0 Hz)', min_value=-0.999 if raw_input else -input_limit, max_value=input_limit, value=0.09, help="Impedance at 0 Hz")
+    PA500 = st.number_input('PA500 (Phase Angle at 500 Hz)', min_value=-input_limit, max_value=input_limit, value=-0.07, help="Phase Angle at 500 Hz")
 
 with col2:
-    HFS = st.number_input('HFS (High-Frequency Slope)', min_value=-1000.0, max_value=1000.0, value=-0.13, help="High-Frequency Slope")
-    DA = st.number_input('DA (Delta Amplitude)', min_value=-1000.0, max_value=1000.0, value=-0.08, help="Delta Amplitude")
+    HFS = st.number_input('HFS (High-Frequency Slope)', min_value=-input_limit, max_value=input_limit, value=-0.13, help="High-Frequency Slope")
+    DA = st.number_input('DA (Delta Amplitude)', min_value=-input_limit, max_value=input_limit, value=-0.08, help="Delta Amplitude")
 
 with col3:
-    Area = st.number_input('Area', min_value=-1000.0, max_value=1000.0, value=0.12, help="Area under the impedance curve")
-    ADA = st.number_input('A.DA (Amplitude Delta Area)', min_value=-1000.0, max_value=1000.0, value=0.08, help="Amplitude Delta Area")
+    Area = st.number_input('Area', min_value=-input_limit, max_value=input_limit, value=0.12, help="Area under the impedance curve")
+    ADA = st.number_input('A.DA (Amplitude Delta Area)', min_value=-input_limit, max_value=input_limit, value=0.08, help="Amplitude Delta Area")
 
 # Add more fields under the same spacious layout
 col4, col5, col6 = st.columns(3)
 
 with col4:
-    Max_IP = st.number_input('Max.IP (Max Impedance Peak)', min_value=-1000.0, max_value=1000.0, value=0.08, help="Maximum Impedance Peak")
+    Max_IP = st.number_input('Max.IP (Max Impedance Peak)', min_value=-input_limit, max_value=input_limit, value=0.08, help="Maximum Impedance Peak")
 
 with col5:
-    DR = st.number_input('DR (Decay Rate)', min_value=-1000.0, max_value=1000.0, value=0.07, help="Decay Rate")
+    DR = st.number_input('DR (Decay Rate)', min_value=-input_limit, max_value=input_limit, value=0.07, help="Decay Rate")
 
 with col6:
-    P = st.number_input('P (Periodicity)', min_value=-1000.0, max_value=1000.0, value=50.0, help="Periodicity of the signal")
+    P = st.number_input('P (Periodicity)', min_value=-input_limit, max_value=input_limit, value=50.0, help="Periodicity of the signal")
 
 # Add custom feature input for I0_log
-I0_log = st.number_input('I0_log (Log of Impedance at 0 Hz)', min_value=-1000.0, max_value=1000.0, value=0.09, help="Log of Impedance at 0 Hz")
+if raw_input:
+    # The I0 input stays above -1, so the log is always finite
+    I0_log = math.log1p(I0)
+else:
+    I0_log = st.number_input('I0_log (Log of Impedance at 0 Hz)', min_value=-input_limit, max_value=input_limit, value=0.09, help="Log of Impedance at 0 Hz")
 
 # Add some space before the prediction button
 st.markdown("---")
 
-# Collect all inputs into a numpy array
-input_data = np.array([I0, PA500, HFS, DA, Area, ADA, Max_IP, DR, P, I0_log]).reshape(1, -1)
+# Collect all inputs into one row (a plain list; the scorer converts it, so
+# numpy is not imported before the form is drawn)
+input_data = [[I0, PA500, HFS, DA, Area, ADA, Max_IP, DR, P, I0_log]]
+metrics.lap('form')
 
 # Map model output to tumor classes
 class_mapping = {0: "Carcinoma", 1: "Fibro-adenoma", 2: "Mastopathy", 3: "Glandular", 4: "Connective", 5: "Adipose"}
@@ -122,11 +148,20 @@ class_mapping = {0: "Carcinoma", 1: "Fibro-adenoma", 2: "Mastopathy", 3: "Glandu
 # Predict when the user clicks the button
 if st.button("🔍 Predict"):
     try:
-        prediction = model.predict(input_data)  # Use input data directly for prediction
-        confidence = model.predict_proba(input_data)  # Get confidence score
+        # Class and confidence come from a single pass over the model, or from
+        # the prediction cache when this row was scored before
+        # One snapshot for scoring and auditing, so a reload in between
+        # cannot log a version that did not make the prediction
+        snapshot = (folded_provider if raw_input else model_provider).get()
+        if raw_input:
+            prediction, confidence, contributions = cached_score(folded_provider, input_data[0][:-1], explain=True, snapshot=snapshot)
+        else:
+            prediction, confidence, contributions = cached_score(model_provider, input_data[0], explain=True, snapshot=snapshot)
+        metrics.lap('predict')
+        audit_prediction(snapshot, input_data[0], prediction[0], confidence[0], raw_input)
         
         predicted_class = class_mapping[prediction[0]]
-        class_confidence = confidence[0][prediction[0]] * 100
+        class_confidence = confidence[0] * 100
         
         # Display the prediction result and confidence
         if predicted_class == "Carcinoma":
@@ -153,6 +188,8 @@ if st.button("🔍 Predict"):
             st.success(f"✅ The tumor is predicted to be: *{predicted_class}*")
         
         st.write(f"🔬 *Model Confidence*: {class_confidence:.2f}% sure the tumor is {predicted_class}.")
+        render_explanation(contributions, prediction[0], class_mapping)
+        check_drift(input_data[0], raw_input)
         
         # Display general medical prescriptions for other tumor types
         if predicted_class == "Mastopathy":
@@ -170,9 +207,28 @@ if st.button("🔍 Predict"):
             st.write("""#### 📋 General Medical Prescription for Adipose Tumors:
             - Consider consultation with a specialist.
             - Removal may be an option if the tumor grows or causes discomfort.""")
+        metrics.lap('result')
     except Exception as e:
         st.error(f"An error occurred: {e}")
 
+# Bulk scoring of exported measurement files
+st.markdown("---")
+render_batch_section(model_provider)
+metrics.lap('batch_section')
+
+# Warm the model up in the background once the form has been sent
+(folded_provider if raw_input else model_provider).preload()
+
+# Model status in the sidebar (loads are counted per process, not per rerun)
+model_stats = model_provider.stats()
+st.sidebar.caption(
+    f"Model {model_stats['version'] or 'not loaded yet'} · "
+    f"loaded {model_stats['load_count']}× · last load {model_stats['last_load_ms']:.1f} ms"
+)
+render_cache_stats()
+render_drift_panel()
+render_metrics_panel(metrics)
+
 # Add a footer with disclaimer
 st.markdown(""" 
 --- 
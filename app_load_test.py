@@ -0,0 +1,208 @@
+"""Headless multi-session load test for the Streamlit apps.
+
+Every simulated session is a ``streamlit.testing.v1.AppTest`` running the
+app script in this process, so the sessions share the model provider, the
+prediction cache and the GIL exactly like the sessions of one
+``streamlit run`` process. Each session:
+
+1. renders the form;
+2. sets the ten number inputs to a row of preprocessed_data.csv;
+3. clicks "🔍 Predict" and checks that the app shows the class the model
+   predicts for that row, without an error or an exception.
+
+For every number of concurrent sessions in ``--sessions`` the harness
+reports per-session latency (p50/p95/p99 of the Predict rerun), throughput,
+process CPU use (in cores) and resident memory. This shows how many sessions
+one process can serve before latency collapses.
+
+Usage:
+    python app_load_test.py --apps app.py "app(2).py" --sessions 1 4 16 32 --iterations 5
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from features import FEATURE_COLUMNS, class_mapping
+from load_generator import load_sample_rows, percentile
+from model_provider import BASE_DIR
+from model_registry import get_registry_provider
+
+APPS = ['app.py', 'app(1).py', 'app(2).py']
+PREDICT_LABEL = "🔍 Predict"
+RESULT_TEXT = "The tumor is predicted to be"
+
+
+class SessionError(AssertionError):
+    pass
+
+
+def rss_mb():
+    """Current resident set size, falling back to the peak where /proc is missing."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def expected_class(row):
+    class_ids, _ = get_registry_provider('model').get().scorer.score([row])
+    return class_mapping[class_ids[0].item()]
+
+
+def _set_inputs(at, row):
+    # Labels start with the column name, e.g. "A.DA (Amplitude Delta Area)"
+    inputs = {w.label.split(' ')[0]: w for w in at.number_input}
+    for name, value in zip(FEATURE_COLUMNS, row):
+        if name not in inputs:
+            raise SessionError(f"No number input for {name}")
+        inputs[name].set_value(value)
+
+
+def _check_result(at, row):
+    if at.exception:
+        raise SessionError(f"Script raised: {at.exception[0].value}")
+    messages = [e.value for e in at.error] + [s.value for s in at.success]
+    failures = [m for m in messages if 'error occurred' in m]
+    if failures:
+        raise SessionError(failures[0])
+    results = [m for m in messages if RESULT_TEXT in m]
+    if not results:
+        raise SessionError("No prediction shown")
+    expected = expected_class(row)
+    if f"*{expected}*" not in results[0]:
+        raise SessionError(f"Expected {expected}, got: {results[0]}")
+
+
+def run_session(app, rows, iterations, timeout=30):
+    """One simulated user: render, then ``iterations`` predictions. Returns latencies in ms."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(BASE_DIR, app), default_timeout=timeout)
+    start = time.perf_counter()
+    at.run()
+    first_render = (time.perf_counter() - start) * 1000
+    latencies = []
+    for row in rows[:iterations]:
+        _set_inputs(at, row)
+        button = next((b for b in at.button if b.label == PREDICT_LABEL), None)
+        if button is None:
+            raise SessionError("No Predict button")
+        start = time.perf_counter()
+        button.click().run()
+        latencies.append((time.perf_counter() - start) * 1000)
+        _check_result(at, row)
+    return first_render, latencies
+
+
+def run_level(app, n_sessions, rows, iterations, seed=0):
+    """Run ``n_sessions`` concurrent sessions and aggregate their measurements."""
+    rng = random.Random(seed)
+    session_rows = [rng.sample(rows, iterations) for _ in range(n_sessions)]
+    peak_rss = rss_mb()
+    stop = threading.Event()
+
+    def sample_memory():
+        nonlocal peak_rss
+        while not stop.wait(0.05):
+            peak_rss = max(peak_rss, rss_mb())
+
+    sampler = threading.Thread(target=sample_memory, daemon=True)
+    sampler.start()
+    cpu_start, wall_start = cpu_seconds(), time.perf_counter()
+    renders, latencies, failures = [], [], []
+    with ThreadPoolExecutor(max_workers=n_sessions) as pool:
+        futures = [pool.submit(run_session, app, r, iterations) for r in session_rows]
+        for future in futures:
+            try:
+                first_render, session_latencies = future.result()
+            except Exception as e:
+                failures.append(str(e))
+                continue
+            renders.append(first_render)
+            latencies.extend(session_latencies)
+    wall = time.perf_counter() - wall_start
+    cpu = cpu_seconds() - cpu_start
+    stop.set()
+    sampler.join()
+
+    result = {
+        'app': app,
+        'sessions': n_sessions,
+        'predictions': len(latencies),
+        'failures': len(failures),
+        'throughput_rps': len(latencies) / wall if wall else 0.0,
+        'cpu_cores': cpu / wall if wall else 0.0,
+        'rss_mb': rss_mb(),
+        'peak_rss_mb': peak_rss,
+        'errors': failures[:5],
+    }
+    if latencies:
+        result.update(
+            first_render_p50_ms=percentile(renders, 50),
+            p50_ms=percentile(latencies, 50),
+            p95_ms=percentile(latencies, 95),
+            p99_ms=percentile(latencies, 99),
+        )
+    return result
+
+
+def print_table(results):
+    columns = ['app', 'sessions', 'predictions', 'failures', 'p50_ms', 'p95_ms', 'p99_ms',
+               'throughput_rps', 'cpu_cores', 'peak_rss_mb']
+    print('  '.join(f"{c:>14}" for c in columns))
+    for r in results:
+        print('  '.join(f"{r.get(c, float('nan')):>14.2f}" if isinstance(r.get(c, 0.0), float) else f"{r[c]:>14}"
+                        for c in columns))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--apps', nargs='+', default=APPS)
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--iterations', type=int, default=5, help="predictions per session")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    # Synthetic predictions must not reach the compliance log (as in benchmark.py)
+    previous = os.environ.get('TUMOR_AUDIT')
+    os.environ['TUMOR_AUDIT'] = '0'
+    try:
+        rows = load_sample_rows()
+        results = []
+        for app in args.apps:
+            # Warm-up: the first session pays for the imports and the model load
+            run_session(app, rows, 1)
+            for n in args.sessions:
+                results.append(run_level(app, n, rows, args.iterations, args.seed))
+    finally:
+        if previous is None:
+            del os.environ['TUMOR_AUDIT']
+        else:
+            os.environ['TUMOR_AUDIT'] = previous
+    print_table(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if any(r['failures'] for r in results):
+        for r in results:
+            for error in r['errors']:
+                print(f"{r['app']} x{r['sessions']}: {error}", file=sys.stderr)
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,450 @@
+"""Buffered, batched audit log of every prediction.
+
+``record()`` only appends a tuple to an in-memory ring buffer, so a click in
+the app does not wait for the disk. A background thread takes the buffered
+rows in batches and writes each batch in one transaction (SQLite) or one
+``write`` call (append-only JSON lines). Each row holds a timestamp, source,
+input space, model version, predicted class, confidence and the ten inputs.
+
+Durability (``fsync``):
+
+- ``'batch'``: every batch reaches the disk before the next one is written;
+- ``'interval'``: at most every ``fsync_interval`` seconds (SQLite: WAL with
+  ``synchronous=NORMAL`` and periodic checkpoints);
+- ``'off'``: left to the operating system.
+
+When the buffer is full, ``overflow='block'`` makes producers wait up to
+``block_timeout`` seconds for the writer to catch up, and ``'drop'`` drops
+the row at once. Dropped rows are counted in ``stats()``.
+
+The SQLite table is indexed by time and by (class, time), so ``query`` pulls
+a time range or a class without a table scan.
+
+Configuration for the apps, bulk scoring and the inference server:
+``TUMOR_AUDIT=0`` turns the log off, ``TUMOR_AUDIT_PATH`` (``.db`` /
+``.sqlite`` for SQLite, anything else for JSON lines), ``TUMOR_AUDIT_FSYNC``
+and ``TUMOR_AUDIT_OVERFLOW``.
+
+Usage:
+    python audit_log.py query --since 2026-10-01 --until 2026-10-02 --class Carcinoma
+    python audit_log.py query audit/predictions.db --count
+"""
+import argparse
+import atexit
+import csv
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+from features import FEATURE_COLUMNS, class_mapping
+from metrics import get_metrics
+from model_provider import BASE_DIR
+
+DEFAULT_PATH = os.path.join(BASE_DIR, 'audit', 'predictions.db')
+DEFAULT_CAPACITY = 65_536
+DEFAULT_BATCH_SIZE = 1024
+FLUSH_INTERVAL = 0.25
+FSYNC_INTERVAL = 1.0
+BLOCK_TIMEOUT = 5.0
+FSYNC_POLICIES = ('batch', 'interval', 'off')
+OVERFLOW_POLICIES = ('block', 'drop')
+SQLITE_SYNCHRONOUS = {'batch': 'FULL', 'interval': 'NORMAL', 'off': 'OFF'}
+
+# SQLite column names for the features (no dots)
+INPUT_COLUMNS = [name.lower().replace('.', '_') for name in FEATURE_COLUMNS]
+COLUMNS = ['ts', 'source', 'space', 'model_version', 'class_id', 'predicted_class', 'confidence'] + INPUT_COLUMNS
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    source TEXT NOT NULL,
+    space TEXT NOT NULL,
+    model_version TEXT,
+    class_id INTEGER NOT NULL,
+    predicted_class TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    {', '.join(f'{c} REAL' for c in INPUT_COLUMNS)}
+);
+CREATE INDEX IF NOT EXISTS predictions_ts ON predictions (ts);
+CREATE INDEX IF NOT EXISTS predictions_class_ts ON predictions (predicted_class, ts);
+"""
+
+
+def model_version(snapshot):
+    """Audit name of a provider snapshot: artifact label and full content hash."""
+    return f"{snapshot.label}@{snapshot.version}"
+
+
+def is_sqlite(path):
+    return path.endswith(('.db', '.sqlite', '.sqlite3'))
+
+
+class RingBuffer:
+    """Fixed-capacity FIFO shared by producer threads and one consumer."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._items = [None] * capacity
+        self._head = 0
+        self._size = 0
+        self._closed = False
+        self._kicked = False
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def put_many(self, items, timeout=None):
+        """Append ``items``, waiting up to ``timeout`` for room. Returns how many fit."""
+        accepted = 0
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while accepted < len(items):
+                room = self.capacity - self._size
+                if not room:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if self._closed or (remaining is not None and remaining <= 0):
+                        break
+                    self._cond.wait(remaining)
+                    continue
+                n = min(room, len(items) - accepted)
+                tail = (self._head + self._size) % self.capacity
+                first = min(n, self.capacity - tail)
+                self._items[tail:tail + first] = items[accepted:accepted + first]
+                self._items[:n - first] = items[accepted + first:accepted + n]
+                self._size += n
+                accepted += n
+                self._cond.notify_all()
+        return accepted
+
+    def take(self, max_items, timeout):
+        """Remove up to ``max_items``, waiting up to ``timeout`` for that many."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._size < max_items and not self._closed and not self._kicked:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            self._kicked = False
+            n = min(self._size, max_items)
+            first = min(n, self.capacity - self._head)
+            out = self._items[self._head:self._head + first] + self._items[:n - first]
+            self._items[self._head:self._head + first] = [None] * first
+            self._items[:n - first] = [None] * (n - first)
+            self._head = (self._head + n) % self.capacity
+            self._size -= n
+            if n:
+                self._cond.notify_all()
+            return out
+
+    def kick(self):
+        """Make the consumer take what is buffered now instead of waiting for a full batch."""
+        with self._cond:
+            self._kicked = True
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class SQLiteWriter:
+    def __init__(self, path, fsync):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS[fsync]}")
+        self.conn.executescript(SCHEMA)
+        self.insert = f"INSERT INTO predictions ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+
+    def write(self, rows):
+        with self.conn:
+            self.conn.executemany(self.insert, rows)
+
+    def sync(self):
+        # With synchronous=NORMAL only checkpoints fsync the WAL
+        self.conn.execute('PRAGMA wal_checkpoint(PASSIVE)')
+
+    def close(self):
+        self.conn.close()
+
+
+class JsonLinesWriter:
+    def __init__(self, path, fsync):
+        self.fsync = fsync
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def write(self, rows):
+        self.file.write(''.join(json.dumps(dict(zip(COLUMNS, row))) + '\n' for row in rows))
+        self.file.flush()
+        if self.fsync == 'batch':
+            os.fsync(self.file.fileno())
+
+    def sync(self):
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+
+class AuditLog:
+    def __init__(self, path=DEFAULT_PATH, capacity=DEFAULT_CAPACITY, batch_size=DEFAULT_BATCH_SIZE,
+                 flush_interval=FLUSH_INTERVAL, fsync='batch', fsync_interval=FSYNC_INTERVAL,
+                 overflow='block', block_timeout=BLOCK_TIMEOUT):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {', '.join(FSYNC_POLICIES)}, not {fsync!r}")
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {', '.join(OVERFLOW_POLICIES)}, not {overflow!r}")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.block_timeout = block_timeout if overflow == 'block' else 0
+        writer_class = SQLiteWriter if is_sqlite(path) else JsonLinesWriter
+        self._writer = writer_class(path, fsync)
+        self._buffer = RingBuffer(capacity)
+        self._lock = threading.Lock()
+        self._written_cond = threading.Condition(self._lock)
+        self.accepted = 0
+        self.written = 0
+        self.failed = 0
+        self.dropped = 0
+        self.batches = 0
+        self.blocked_seconds = 0.0
+        self._thread = threading.Thread(target=self._run, name='audit-log', daemon=True)
+        self._thread.start()
+
+    def record(self, inputs, class_id, confidence, model_version, source='app', space='scaled'):
+        """Buffer one prediction. Returns False if it was dropped."""
+        row = (time.time(), source, space, model_version, int(class_id), class_mapping[int(class_id)],
+               float(confidence), *map(float, inputs))
+        return self._put([row]) == 1
+
+    def record_many(self, X, class_ids, confidence, model_version, source='batch', space='raw'):
+        """Buffer a scored block: (n, 10) inputs with their classes and confidences."""
+        ts = time.time()
+        rows = [(ts, source, space, model_version, c, class_mapping[c], p, *x)
+                for c, p, x in zip(class_ids.tolist(), confidence.tolist(), X.tolist())]
+        return self._put(rows)
+
+    def _put(self, rows):
+        start = time.perf_counter()
+        accepted = self._buffer.put_many(rows, self.block_timeout)
+        waited = time.perf_counter() - start
+        with self._lock:
+            self.accepted += accepted
+            self.dropped += len(rows) - accepted
+            if len(rows) > accepted or waited > 0.001:
+                self.blocked_seconds += waited
+        return accepted
+
+    def _run(self):
+        metrics = get_metrics()
+        last_sync = time.monotonic()
+        while True:
+            rows = self._buffer.take(self.batch_size, self.flush_interval)
+            if rows:
+                try:
+                    with metrics.timer('audit_write'):
+                        self._writer.write(rows)
+                    ok = True
+                except Exception as e:
+                    print(f"Audit log write of {len(rows)} rows failed: {e}", file=sys.stderr)
+                    ok = False
+                with self._written_cond:
+                    if ok:
+                        self.written += len(rows)
+                        self.batches += 1
+                    else:
+                        self.failed += len(rows)
+                    self._written_cond.notify_all()
+            if self.fsync == 'interval' and time.monotonic() - last_sync >= self.fsync_interval:
+                self._writer.sync()
+                last_sync = time.monotonic()
+            if not rows and self._buffer.closed and not len(self._buffer):
+                break
+        if self.fsync == 'interval':
+            self._writer.sync()
+        self._writer.close()
+
+    def flush(self, timeout=None):
+        """Wait until everything buffered so far is written. Returns False on timeout."""
+        with self._lock:
+            target = self.accepted
+        self._buffer.kick()
+        with self._written_cond:
+            return self._written_cond.wait_for(lambda: self.written + self.failed >= target, timeout)
+
+    def close(self, timeout=None):
+        """Write out the buffer and stop the writer thread."""
+        self._buffer.close()
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'path': self.path,
+                'accepted': self.accepted,
+                'written': self.written,
+                'failed': self.failed,
+                'dropped': self.dropped,
+                'pending': len(self._buffer),
+                'capacity': self._buffer.capacity,
+                'batches': self.batches,
+                'mean_batch_size': self.written / self.batches if self.batches else 0.0,
+                'blocked_seconds': self.blocked_seconds,
+            }
+
+
+def chunk_recorder(log, model_version, source='batch'):
+    """An ``on_chunk`` callback for batch_scoring that records every scored row."""
+    import numpy as np
+
+    from features import RAW_COLUMNS, add_log_feature
+
+    class_ids = {name: i for i, name in class_mapping.items()}
+
+    def on_chunk(chunk, result):
+        raw = chunk[RAW_COLUMNS].to_numpy(dtype=np.float64) if hasattr(chunk, 'columns') else chunk
+        ids = np.array([class_ids[name] for name in result['predicted_class']])
+        log.record_many(add_log_feature(raw), ids, result['confidence'].to_numpy(dtype=np.float64),
+                        model_version, source=source, space='raw')
+
+    return on_chunk
+
+
+_log = None
+_log_lock = threading.Lock()
+
+
+def get_audit_log():
+    """Return the process-wide AuditLog, or None when TUMOR_AUDIT=0."""
+    global _log
+    if _log is not None or os.environ.get('TUMOR_AUDIT', '1') == '0':
+        return _log
+    with _log_lock:
+        if _log is None:
+            _log = AuditLog(
+                os.environ.get('TUMOR_AUDIT_PATH', DEFAULT_PATH),
+                fsync=os.environ.get('TUMOR_AUDIT_FSYNC', 'batch'),
+                overflow=os.environ.get('TUMOR_AUDIT_OVERFLOW', 'block'),
+            )
+            # Rows still in the buffer are written when the process exits
+            atexit.register(_log.close)
+        return _log
+
+
+def parse_time(value):
+    """Epoch seconds from a number or an ISO 8601 date/time (local time if naive)."""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def _where(since, until, predicted_class, model_version):
+    where, params = [], []
+    for clause, value in [('ts >= ?', since), ('ts < ?', until), ('predicted_class = ?', predicted_class),
+                          ('model_version = ?', model_version)]:
+        if value is not None:
+            where.append(clause)
+            params.append(value)
+    return (' WHERE ' + ' AND '.join(where) if where else ''), params
+
+
+def _read_sqlite(path, sql, params):
+    # Read-only, so a running writer is never blocked
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        yield from conn.execute(sql, params)
+    finally:
+        conn.close()
+
+
+def _read_jsonl(path, since, until, predicted_class, model_version):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            row = json.loads(line)
+            if ((since is not None and row['ts'] < since) or (until is not None and row['ts'] >= until)
+                    or (predicted_class is not None and row['predicted_class'] != predicted_class)
+                    or (model_version is not None and row['model_version'] != model_version)):
+                continue
+            yield row
+
+
+def query(path=DEFAULT_PATH, since=None, until=None, predicted_class=None, model_version=None, limit=None):
+    """Yield the rows in [since, until) as dicts, oldest first.
+
+    SQLite logs are read through the (class, time) or time index. JSON lines
+    logs have no index and are scanned.
+    """
+    if is_sqlite(path):
+        where, params = _where(since, until, predicted_class, model_version)
+        sql = f"SELECT {', '.join(COLUMNS)} FROM predictions{where} ORDER BY ts"
+        if limit is not None:
+            sql += f' LIMIT {int(limit)}'
+        for row in _read_sqlite(path, sql, params):
+            yield dict(zip(COLUMNS, row))
+        return
+    for n, row in enumerate(_read_jsonl(path, since, until, predicted_class, model_version)):
+        if limit is not None and n >= limit:
+            return
+        yield row
+
+
+def count_by_class(path=DEFAULT_PATH, since=None, until=None, model_version=None):
+    """{class: rows} in [since, until), counted inside SQLite when possible."""
+    if is_sqlite(path):
+        where, params = _where(since, until, None, model_version)
+        sql = f"SELECT predicted_class, COUNT(*) FROM predictions{where} GROUP BY predicted_class"
+        return dict(_read_sqlite(path, sql, params))
+    counts = {}
+    for row in _read_jsonl(path, since, until, None, model_version):
+        counts[row['predicted_class']] = counts.get(row['predicted_class'], 0) + 1
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    q = commands.add_parser('query', help="print predictions by time range and class")
+    q.add_argument('path', nargs='?', default=os.environ.get('TUMOR_AUDIT_PATH', DEFAULT_PATH))
+    q.add_argument('--since', type=parse_time, help="epoch seconds or ISO date/time (inclusive)")
+    q.add_argument('--until', type=parse_time, help="epoch seconds or ISO date/time (exclusive)")
+    q.add_argument('--class', dest='predicted_class', choices=list(class_mapping.values()))
+    q.add_argument('--model-version')
+    q.add_argument('--limit', type=int)
+    q.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+    q.add_argument('--count', action='store_true', help="print the number of matching rows per class instead")
+    args = parser.parse_args(argv)
+
+    if args.count:
+        counts = count_by_class(args.path, args.since, args.until, args.model_version)
+        for name, n in sorted(counts.items(), key=lambda kv: -kv[1]):
+            if args.predicted_class in (None, name):
+                print(f"{name}\t{n}")
+        return
+    rows = query(args.path, args.since, args.until, args.predicted_class, args.model_version, args.limit)
+    if args.format == 'jsonl':
+        for row in rows:
+            print(json.dumps(row))
+        return
+    out = csv.writer(sys.stdout)
+    out.writerow(['time'] + COLUMNS)
+    for row in rows:
+        out.writerow([datetime.fromtimestamp(row['ts']).isoformat(timespec='milliseconds')] + list(row.values()))
+
+
+if __name__ == '__main__':
+    main()
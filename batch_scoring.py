@@ -0,0 +1,241 @@
+"""Bulk scoring of measurement files laid out like data.csv.
+
+The input is read in fixed-size chunks, so memory use depends on the chunk
+size and not on the file size. Each chunk is scored in one vectorized pass
+of the compiled inference engine (see inference.py).
+
+Usage:
+    python batch_scoring.py measurements.csv -o predictions.csv
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from features import FEATURE_COLUMNS, RAW_COLUMNS, add_log_feature, class_names
+from inference import compile_model, top_features
+from model_provider import get_provider
+from model_registry import get_registry_provider
+
+DEFAULT_CHUNKSIZE = 10_000
+EXPLAIN_TOP_K = 3
+
+
+def default_provider():
+    """Prefer the active version's folded raw-input model when it has one."""
+    folded = get_registry_provider('folded')
+    return folded if folded.exists() else get_registry_provider('model')
+
+
+def raw_scorer(scorer):
+    """Return a scorer for the raw data.csv columns.
+
+    Folded models take raw rows as they are. Every other model was trained
+    on standardized features, so the persisted feature pipeline is put in
+    front of it. Without a pipeline raw rows cannot be scaled, and guessing
+    would return meaningless classes, so this raises.
+    """
+    if getattr(scorer, 'raw_input', False):
+        return scorer
+    from feature_pipeline import PipelineScorer, load_pipeline
+
+    pipeline = load_pipeline()
+    if pipeline is None:
+        raise ValueError(
+            "The model takes standardized features and no feature pipeline is available to scale "
+            "raw rows. Publish a version with train.py or export feature_pipeline.pkl from the notebook."
+        )
+    return PipelineScorer(pipeline, scorer)
+
+
+class ScoringReport:
+    def __init__(self, rows, seconds):
+        self.rows = rows
+        self.seconds = seconds
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.seconds if self.seconds > 0 else float('inf')
+
+    def __str__(self):
+        return f"Scored {self.rows} rows in {self.seconds:.2f}s ({self.rows_per_sec:,.0f} rows/sec)"
+
+
+def chunk_features(chunk, out=None, derive_log=True):
+    """Build the (n, 10) model input from one chunk of a data.csv-style frame.
+
+    With ``derive_log=False`` the (n, 9) raw block is returned as is, for
+    scorers that take raw measurements (see feature_pipeline.py).
+    """
+    chunk.columns = chunk.columns.str.strip()
+    missing = [c for c in RAW_COLUMNS if c not in chunk.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    raw = chunk[RAW_COLUMNS].to_numpy(dtype=np.float64)
+    if not derive_log:
+        return raw
+    if out is not None and out.shape[0] != raw.shape[0]:
+        out = None
+    return add_log_feature(raw, out=out)
+
+
+def _result_frame(scorer, X, true_labels=None, explain=False):
+    if explain:
+        if not hasattr(scorer, 'explain'):
+            raise ValueError("The model has no closed-form explanations (only linear models do)")
+        class_ids, confidence, contributions = scorer.explain(X)
+    else:
+        class_ids, confidence = scorer.score(X)
+    # Models published with a pipeline carry their own class order
+    label_classes = getattr(scorer, 'label_classes', None)
+    names = np.asarray(class_names(label_classes))
+    result = pd.DataFrame({
+        'predicted_class': names[class_ids],
+        'confidence': confidence,
+    })
+    if label_classes is not None:
+        # The data.csv code, comparable with the input's own Class column
+        result.insert(1, 'predicted_label', np.asarray(label_classes)[class_ids])
+    if explain:
+        # Top features for the predicted class, whose column is its index in classes_
+        idx, values = top_features(contributions, np.searchsorted(scorer.classes_, class_ids), EXPLAIN_TOP_K)
+        names = np.asarray(FEATURE_COLUMNS)
+        for r in range(idx.shape[1]):
+            result[f'top_feature_{r + 1}'] = names[idx[:, r]]
+            result[f'top_contribution_{r + 1}'] = values[:, r]
+    if true_labels is not None:
+        result.insert(0, 'Class', true_labels)
+    return result
+
+
+def score_chunk(scorer, chunk, out=None, explain=False):
+    X = chunk_features(chunk, out=out, derive_log=not getattr(scorer, 'raw_input', False))
+    labels = chunk['Class'].to_numpy() if 'Class' in chunk.columns else None
+    return _result_frame(scorer, X, labels, explain), X
+
+
+def score_csv(source, dest, scorer=None, chunksize=DEFAULT_CHUNKSIZE, on_chunk=None, explain=False):
+    """Score ``source`` chunk by chunk and write class + confidence to ``dest``.
+
+    ``source`` and ``dest`` may be paths or file objects. ``on_chunk`` is
+    called with (chunk, result) after each chunk is written. ``explain``
+    adds the three features that contributed most to each predicted class.
+    """
+    scorer = raw_scorer(scorer if scorer is not None else default_provider().get().scorer)
+    rows = 0
+    buffer = None
+    start = time.perf_counter()
+    for i, chunk in enumerate(pd.read_csv(source, chunksize=chunksize)):
+        result, buffer = score_chunk(scorer, chunk, out=buffer, explain=explain)
+        result.to_csv(dest, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+        rows += len(result)
+        if on_chunk is not None:
+            on_chunk(chunk, result)
+    return ScoringReport(rows, time.perf_counter() - start)
+
+
+def score_dataset(dataset, dest, scorer=None, chunksize=DEFAULT_CHUNKSIZE, on_chunk=None, explain=False):
+    """Like ``score_csv``, but reads a memory-mapped ``CachedDataset``.
+
+    Rows are copied from the mapped columns straight into the model input
+    buffer; the CSV is not parsed again.
+    """
+    scorer = raw_scorer(scorer if scorer is not None else default_provider().get().scorer)
+    derive_log = not getattr(scorer, 'raw_input', False)
+    classes = np.array(dataset.classes) if dataset.labels is not None else None
+    buffer = None
+    start = time.perf_counter()
+    for i, (first, raw) in enumerate(dataset.iter_blocks(RAW_COLUMNS, chunksize)):
+        if derive_log:
+            if buffer is None or buffer.shape[0] != raw.shape[0]:
+                buffer = np.empty((raw.shape[0], len(FEATURE_COLUMNS)))
+            X = add_log_feature(raw, out=buffer)
+        else:
+            X = raw
+        labels = classes[dataset.labels[first:first + len(raw)]] if classes is not None else None
+        result = _result_frame(scorer, X, labels, explain)
+        result.to_csv(dest, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+        if on_chunk is not None:
+            on_chunk(raw, result)
+    return ScoringReport(len(dataset), time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('input', help="CSV with the data.csv columns (Class optional)")
+    parser.add_argument('-o', '--output', default='-', help="output CSV (default: stdout)")
+    parser.add_argument('--model', help="model artifact file (default: the registry's active version, folded if present)")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--float32', action='store_true', help="score in float32 for higher throughput")
+    parser.add_argument('--cache', action='store_true',
+                        help="read the input through the memory-mapped dataset cache (dataset_cache.py)")
+    parser.add_argument('--explain', action='store_true',
+                        help="add the top contributing features of each prediction (linear models only)")
+    parser.add_argument('--cohort', help="also write per-class cohort aggregates (cohort.py) to this JSON file")
+    parser.add_argument('--audit', help="also record every prediction in this audit log (audit_log.py; .db for SQLite)")
+    parser.add_argument('--drift', help="also write the input drift status against data.csv (drift.py) to this JSON file")
+    args = parser.parse_args(argv)
+
+    provider = get_provider(args.model) if args.model else default_provider()
+    snapshot = provider.get()
+    scorer = compile_model(snapshot.model, dtype=np.float32) if args.float32 else snapshot.scorer
+    try:
+        scorer = raw_scorer(scorer)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.cache:
+        from dataset_cache import open_dataset
+
+        source, score = open_dataset(args.input), score_dataset
+    else:
+        source, score = args.input, score_csv
+    callbacks = []
+    if args.cohort:
+        from cohort import CohortAggregator
+
+        aggregator = CohortAggregator(class_names=class_names(getattr(scorer, 'label_classes', None)))
+        callbacks.append(aggregator.on_chunk)
+    if args.drift:
+        from drift import DriftMonitor, Reference
+
+        monitor = DriftMonitor(Reference.from_dataset('raw'))
+        callbacks.append(monitor.on_chunk)
+    if args.audit:
+        from audit_log import AuditLog, chunk_recorder, model_version
+
+        audit = AuditLog(args.audit)
+        callbacks.append(chunk_recorder(audit, model_version(snapshot)))
+
+    def run_callbacks(chunk, result):
+        for callback in callbacks:
+            callback(chunk, result)
+
+    on_chunk = run_callbacks if callbacks else None
+    if args.output == '-':
+        report = score(source, sys.stdout, scorer=scorer, chunksize=args.chunksize, on_chunk=on_chunk,
+                       explain=args.explain)
+    else:
+        with open(args.output, 'w', newline='') as dest:
+            report = score(source, dest, scorer=scorer, chunksize=args.chunksize, on_chunk=on_chunk,
+                           explain=args.explain)
+    print(report, file=sys.stderr)
+    if args.audit:
+        audit.close()
+        stats = audit.stats()
+        print(f"Audit log: {stats['written']} rows written to {args.audit}, {stats['dropped']} dropped", file=sys.stderr)
+    if args.cohort:
+        with open(args.cohort, 'w') as f:
+            json.dump(aggregator.summary(), f)
+    if args.drift:
+        status = monitor.status()
+        for alert in status['alerts']:
+            print(f"Drift alert ({alert['kind']}): {alert['feature']} = {alert['value']:.3f}", file=sys.stderr)
+        with open(args.drift, 'w') as f:
+            json.dump(status, f)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+"""Reproducible benchmarks for the prediction path and app startup.
+
+Cases:
+    single_row.*     one (1, 10) prediction, as app.py did it (sklearn
+                     predict + predict_proba) and as it does now (engine)
+    batch.*          throughput for 1 .. 1M rows synthesized from the
+                     preprocessed_data.csv feature distributions
+    forest_batch.*   the same for forests fitted on preprocessed_data.csv
+                     (100-tree random forest, 50-tree extra trees), sklearn
+                     against the compiled ForestInferenceEngine
+    joblib_load      unpickling best_model.pkl
+    cold_start.*     running each app script in a fresh interpreter
+    peak_rss         peak resident memory of this process and of the app runs
+
+Usage:
+    python benchmark.py run -o bench.json
+    python benchmark.py compare baseline.json bench.json --threshold 0.10
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+import joblib
+import numpy as np
+
+from features import FEATURE_COLUMNS
+from inference import compile_model
+from model_provider import BASE_DIR, DEFAULT_MODEL_PATH
+
+APPS = ['app.py', 'app(1).py', 'app(2).py']
+BATCH_SIZES = [1, 10, 100, 1_000, 10_000, 100_000, 1_000_000]
+FOREST_BATCH_SIZES = [1, 10, 100, 1_000, 2_000, 10_000]
+
+
+def _median_time(fn, repeat, number=1):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number)
+    return statistics.median(times)
+
+
+def _result(value, unit, lower_is_better=True, **extra):
+    return dict(value=value, unit=unit, lower_is_better=lower_is_better, **extra)
+
+
+def synthesize_rows(n, seed=0):
+    """Rows drawn per feature from the preprocessed_data.csv mean/std."""
+    reference = np.genfromtxt(os.path.join(BASE_DIR, 'preprocessed_data.csv'), delimiter=',', names=True)
+    columns = [reference[name] for name in reference.dtype.names if name != 'Class']
+    mean = np.array([c.mean() for c in columns])
+    std = np.array([c.std() for c in columns])
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((n, len(FEATURE_COLUMNS))) * std + mean
+
+
+def bench_single_row(model, scorer, repeat):
+    values = [0.09, -0.07, -0.13, -0.08, 0.12, 0.08, 0.08, 0.07, 50.0, 0.09]
+
+    def sklearn_path():
+        input_data = np.array(values).reshape(1, -1)
+        prediction = model.predict(input_data)
+        confidence = model.predict_proba(input_data)
+        return confidence[0][prediction[0]]
+
+    def engine_path():
+        input_data = np.array(values).reshape(1, -1)
+        return scorer.score(input_data)
+
+    return {
+        'single_row.sklearn': _result(_median_time(sklearn_path, repeat, 100) * 1e6, 'us'),
+        'single_row.engine': _result(_median_time(engine_path, repeat, 100) * 1e6, 'us'),
+    }
+
+
+def bench_batches(model, scorer, repeat, max_rows):
+    results = {}
+    X_all = synthesize_rows(max(n for n in BATCH_SIZES if n <= max_rows))
+    for n in BATCH_SIZES:
+        if n > max_rows:
+            break
+        X = X_all[:n]
+        # Fewer repeats for the big batches keeps the suite runtime bounded
+        reps = repeat if n <= 10_000 else max(1, repeat // 5)
+        t_sklearn = _median_time(lambda: model.predict_proba(X), reps)
+        t_engine = _median_time(lambda: scorer.score(X), reps)
+        results[f'batch.sklearn.{n}'] = _result(n / t_sklearn, 'rows/s', lower_is_better=False)
+        results[f'batch.engine.{n}'] = _result(n / t_engine, 'rows/s', lower_is_better=False)
+    return results
+
+
+def bench_forest_batches(repeat, max_rows):
+    """Forests compile to the flattened engine; it must not lose to sklearn on any batch size."""
+    from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+
+    reference = np.genfromtxt(os.path.join(BASE_DIR, 'preprocessed_data.csv'), delimiter=',', names=True,
+                              dtype=None, encoding=None)
+    X_train = np.column_stack([reference[name] for name in reference.dtype.names if name != 'Class'])
+    y_train = reference['Class']
+    forests = {
+        'random_forest': RandomForestClassifier(n_estimators=100, random_state=0),
+        'extra_trees': ExtraTreesClassifier(n_estimators=50, random_state=0),
+    }
+    results = {}
+    X_all = synthesize_rows(max(n for n in FOREST_BATCH_SIZES if n <= max_rows), seed=1)
+    for name, forest in forests.items():
+        forest.fit(X_train, y_train)
+        scorer = compile_model(forest)
+        for n in FOREST_BATCH_SIZES:
+            if n > max_rows:
+                break
+            X = X_all[:n]
+            t_sklearn = _median_time(lambda: forest.predict_proba(X), repeat)
+            t_engine = _median_time(lambda: scorer.score(X), repeat)
+            results[f'forest_batch.{name}.sklearn.{n}'] = _result(n / t_sklearn, 'rows/s', lower_is_better=False)
+            results[f'forest_batch.{name}.engine.{n}'] = _result(n / t_engine, 'rows/s', lower_is_better=False)
+    return results
+
+
+def bench_joblib_load(path, repeat):
+    return {'joblib_load': _result(_median_time(lambda: joblib.load(path), repeat) * 1000, 'ms')}
+
+
+def _run_child(args):
+    """Run a child process; return (wall seconds, peak RSS in KiB)."""
+    start = time.perf_counter()
+    # Benchmark runs must not write to the prediction audit log
+    env = dict(os.environ, TUMOR_AUDIT='0')
+    proc = subprocess.Popen(args, cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return time.perf_counter() - start, usage.ru_maxrss, proc.returncode
+
+
+def bench_cold_start(repeat):
+    results = {}
+    baseline = statistics.median(_run_child([sys.executable, '-c', 'pass'])[0] for _ in range(repeat))
+    for app in APPS:
+        # Streamlit runs scripts in "bare mode" outside `streamlit run`, which
+        # still executes every import and top-level statement.
+        code = f"import runpy; runpy.run_path({app!r}, run_name='__main__')"
+        runs = [_run_child([sys.executable, '-c', code]) for _ in range(repeat)]
+        if any(rc != 0 for _, _, rc in runs):
+            results[f'cold_start.{app}'] = _result(None, 'ms', error="app script exited with an error")
+            continue
+        wall = statistics.median(w for w, _, _ in runs)
+        results[f'cold_start.{app}'] = _result((wall - baseline) * 1000, 'ms', interpreter_ms=baseline * 1000)
+        results[f'peak_rss.{app}'] = _result(max(r for _, r, _ in runs) / 1024, 'MiB')
+    return results
+
+
+def run(args):
+    model = joblib.load(args.model)
+    scorer = compile_model(model)
+    results = {}
+    results.update(bench_single_row(model, scorer, args.repeat))
+    results.update(bench_batches(model, scorer, args.repeat, args.max_rows))
+    results.update(bench_forest_batches(args.repeat, args.max_rows))
+    results.update(bench_joblib_load(args.model, args.repeat))
+    if not args.skip_apps:
+        results.update(bench_cold_start(max(3, args.repeat // 2)))
+    results['peak_rss.benchmark'] = _result(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 'MiB')
+
+    import sklearn
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'sklearn': sklearn.__version__,
+            'model': os.path.basename(args.model),
+            'scorer': type(scorer).__name__,
+        },
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    print(text)
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+    with open(args.current) as f:
+        current = json.load(f)['results']
+
+    regressions = []
+    print(f"{'case':<32}{'baseline':>14}{'current':>14}{'change':>10}")
+    for name in sorted(set(baseline) & set(current)):
+        old, new = baseline[name], current[name]
+        if old['value'] in (None, 0) or new['value'] is None:
+            continue
+        change = (new['value'] - old['value']) / old['value']
+        worse = change > args.threshold if old['lower_is_better'] else change < -args.threshold
+        flag = '  REGRESSION' if worse else ''
+        print(f"{name:<32}{old['value']:>14.3f}{new['value']:>14.3f}{change:>+10.1%}{flag}")
+        if worse:
+            regressions.append(name)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_run = sub.add_parser('run', help="run the suite and print JSON")
+    p_run.add_argument('-o', '--output', help="also write the JSON report here")
+    p_run.add_argument('--model', default=DEFAULT_MODEL_PATH)
+    p_run.add_argument('--repeat', type=int, default=10)
+    p_run.add_argument('--max-rows', type=int, default=BATCH_SIZES[-1])
+    p_run.add_argument('--skip-apps', action='store_true', help="skip the app cold-start cases")
+
+    p_cmp = sub.add_parser('compare', help="flag regressions between two reports")
+    p_cmp.add_argument('baseline')
+    p_cmp.add_argument('current')
+    p_cmp.add_argument('--threshold', type=float, default=0.10, help="relative change treated as a regression")
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        run(args)
+        return 0
+    return compare(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""Fixed-size aggregates of a scored cohort, for plotting.
+
+Plotting every scored row does not scale. ``CohortAggregator`` instead keeps,
+per predicted class and feature, a histogram on fixed bins plus the min and
+max. It is updated chunk by chunk with one ``np.bincount`` per chunk. Medians
+and IQRs are read off the histograms. The result (``summary()``) has the same
+size for 10 rows and for 100,000, and so do the figures drawn from it.
+
+Bins span the training data's range per feature (data.csv, read through the
+dataset cache), with one under- and one overflow bin for values outside it.
+"""
+import os
+
+import numpy as np
+
+from features import FEATURE_COLUMNS, RAW_COLUMNS, add_log_feature, class_names
+from running_stats import histogram_quantiles
+
+DEFAULT_BINS = 40
+CLASS_NAMES = class_names()
+
+
+def reference_edges(source=None, bins=DEFAULT_BINS):
+    """(n_features, bins + 1) bin edges spanning the training range of each feature."""
+    from dataset_cache import open_dataset
+    from model_provider import BASE_DIR
+
+    source = source or os.path.join(BASE_DIR, 'data.csv')
+    X = add_log_feature(open_dataset(source, dtype=np.float64).matrix(RAW_COLUMNS))
+    lo, hi = np.nanmin(X, axis=0), np.nanmax(X, axis=0)
+    hi = np.where(hi > lo, hi, lo + 1.0)
+    return np.linspace(lo, hi, bins + 1).T.copy()
+
+
+class CohortAggregator:
+    def __init__(self, edges=None, class_names=CLASS_NAMES):
+        # ``class_names`` should come from the scoring model (features.class_names)
+        self.edges = reference_edges() if edges is None else np.asarray(edges, dtype=np.float64)
+        self.class_names = list(class_names)
+        n_classes, (n_features, n_edges) = len(self.class_names), self.edges.shape
+        # Bin 0 is the underflow and bin n_edges the overflow
+        self.n_slots = n_edges + 1
+        self.hist = np.zeros((n_classes, n_features, self.n_slots), dtype=np.int64)
+        self.mins = np.full((n_classes, n_features), np.inf)
+        self.maxs = np.full((n_classes, n_features), -np.inf)
+        self.skipped = 0
+
+    def update(self, raw, predicted):
+        """Add one chunk: (n, 9) raw measurements and the predicted class names."""
+        X = add_log_feature(raw)
+        class_index = {name: i for i, name in enumerate(self.class_names)}
+        cls = np.fromiter((class_index[name] for name in predicted), dtype=np.intp, count=len(predicted))
+        ok = np.isfinite(X).all(axis=1)
+        self.skipped += int((~ok).sum())
+        X, cls = X[ok], cls[ok]
+        if not len(cls):
+            return self
+
+        n_features = X.shape[1]
+        # Per-feature bin of every value, then one flat bincount over
+        # (class, feature, bin) for the whole chunk
+        bins = np.empty(X.shape, dtype=np.intp)
+        for f in range(n_features):
+            edges = self.edges[f]
+            # The training maximum itself belongs to the last regular bin
+            bins[:, f] = np.searchsorted(edges[:-1], X[:, f], side='right')
+            bins[X[:, f] > edges[-1], f] = self.n_slots - 1
+        flat = (cls[:, None] * n_features + np.arange(n_features)) * self.n_slots + bins
+        self.hist += np.bincount(flat.ravel(), minlength=self.hist.size).reshape(self.hist.shape)
+
+        for c in np.unique(cls):
+            rows = X[cls == c]
+            self.mins[c] = np.minimum(self.mins[c], rows.min(axis=0))
+            self.maxs[c] = np.maximum(self.maxs[c], rows.max(axis=0))
+        return self
+
+    def on_chunk(self, chunk, result):
+        """Callback for ``batch_scoring.score_csv`` / ``score_dataset``."""
+        raw = chunk[RAW_COLUMNS].to_numpy(dtype=np.float64) if hasattr(chunk, 'columns') else chunk
+        self.update(raw, result['predicted_class'].to_numpy())
+
+    @property
+    def counts(self):
+        # Every row adds one value per feature; feature 0 counts the rows
+        return self.hist[:, 0, :].sum(axis=1)
+
+    def quantiles(self, qs=(0.25, 0.5, 0.75)):
+        """(n_classes, n_features, len(qs)) values, interpolated inside the bins."""
+        n_classes, n_features, _ = self.hist.shape
+        out = np.empty((n_classes, n_features, len(qs)))
+        for c in range(n_classes):
+            for f in range(n_features):
+                out[c, f] = histogram_quantiles(self.hist[c, f], self.edges[f], self.mins[c, f], self.maxs[c, f], qs)
+        return out
+
+    def summary(self):
+        """JSON-ready aggregates. Their size depends on classes × features × bins only."""
+        quantiles = self.quantiles()
+        lo, hi = self.edges[:, 0], self.edges[:, -1]
+        # Radar radii as a fraction of the training range, so every axis is comparable
+        normalized = (quantiles - lo[None, :, None]) / (hi - lo)[None, :, None]
+
+        def tolist(a):
+            # Classes without rows have no quantiles: null in JSON, not NaN
+            return np.where(np.isnan(a), None, a).tolist()
+
+        return {
+            'columns': FEATURE_COLUMNS,
+            'classes': self.class_names,
+            'counts': self.counts.tolist(),
+            'rows': int(self.counts.sum()),
+            'skipped': self.skipped,
+            'edges': self.edges.tolist(),
+            'hist': self.hist.tolist(),
+            'q1': tolist(quantiles[..., 0]),
+            'median': tolist(quantiles[..., 1]),
+            'q3': tolist(quantiles[..., 2]),
+            'radar_q1': tolist(normalized[..., 0]),
+            'radar_median': tolist(normalized[..., 1]),
+            'radar_q3': tolist(normalized[..., 2]),
+        }
@@ -0,0 +1,210 @@
+"""Typed, memory-mapped column cache for the project's CSV datasets.
+
+Each CSV is converted once into ``.cache/datasets/<name>.<path hash>.<dtype>/``,
+keyed by its absolute path so two files of the same name never share a cache:
+
+    manifest.json     source hash/size/mtime, row count, columns, classes
+    <column>.npy      one array per numeric column
+    labels.npy        int codes of the Class column (sorted, like LabelEncoder)
+
+Later reads open the arrays with ``np.load(mmap_mode='r')``, so nothing is
+parsed or copied up front. The cache is rebuilt automatically when the source
+CSV's content hash changes. An unchanged (size, mtime) skips the hash, too.
+
+Usage:
+    python dataset_cache.py data.csv cleaned_data.csv preprocessed_data.csv
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from model_provider import BASE_DIR
+
+CACHE_DIR = os.path.join(BASE_DIR, '.cache', 'datasets')
+MANIFEST = 'manifest.json'
+LABEL_COLUMN = 'Class'
+BUILD_CHUNKSIZE = 100_000
+
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _column_file(name):
+    # Column names such as "A.DA" and "Max.IP" become safe file names
+    return ''.join(c if c.isalnum() or c in '-_' else '_' for c in name) + '.npy'
+
+
+def _chunks(path):
+    for chunk in pd.read_csv(path, chunksize=BUILD_CHUNKSIZE):
+        chunk.columns = chunk.columns.str.strip()
+        yield chunk
+
+
+def build(source, target, dtype=np.float32):
+    """Convert ``source`` into a cache directory at ``target`` (two streaming passes)."""
+    n_rows = 0
+    columns = None
+    classes = set()
+    for chunk in _chunks(source):
+        if columns is None:
+            columns = [c for c in chunk.columns if c != LABEL_COLUMN]
+        n_rows += len(chunk)
+        if LABEL_COLUMN in chunk.columns:
+            classes.update(chunk[LABEL_COLUMN].unique().tolist())
+    has_labels = bool(classes)
+    classes = sorted(classes)
+    vocab = np.array(classes)
+
+    tmp = f"{target}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    arrays = {
+        name: np.lib.format.open_memmap(os.path.join(tmp, _column_file(name)), mode='w+', dtype=dtype, shape=(n_rows,))
+        for name in columns
+    }
+    labels = None
+    if has_labels:
+        labels = np.lib.format.open_memmap(os.path.join(tmp, 'labels.npy'), mode='w+', dtype=np.int64, shape=(n_rows,))
+
+    start = 0
+    for chunk in _chunks(source):
+        end = start + len(chunk)
+        for name, array in arrays.items():
+            array[start:end] = chunk[name].to_numpy(dtype=np.float64)
+        if labels is not None:
+            labels[start:end] = np.searchsorted(vocab, chunk[LABEL_COLUMN].to_numpy())
+        start = end
+    for array in arrays.values():
+        array.flush()
+    if labels is not None:
+        labels.flush()
+    del arrays, labels
+
+    st = os.stat(source)
+    manifest = {
+        'source': os.path.abspath(source),
+        'sha256': file_hash(source),
+        'size': st.st_size,
+        'mtime_ns': st.st_mtime_ns,
+        'n_rows': n_rows,
+        'dtype': np.dtype(dtype).name,
+        'columns': {name: _column_file(name) for name in columns},
+        'classes': classes if has_labels else None,
+    }
+    # The manifest is written last: a directory without one is incomplete
+    with open(os.path.join(tmp, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    # Swap directories; readers that still map the old files keep them
+    old = f"{target}.old-{os.getpid()}"
+    if os.path.exists(target):
+        os.rename(target, old)
+    os.rename(tmp, target)
+    shutil.rmtree(old, ignore_errors=True)
+    return manifest
+
+
+def _read_manifest(target):
+    try:
+        with open(os.path.join(target, MANIFEST)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def cache_target(source, dtype=np.float32, cache_dir=CACHE_DIR):
+    """Cache directory of ``source``, a path relative to the working directory."""
+    source = os.path.abspath(source)
+    key = hashlib.sha256(source.encode()).hexdigest()[:12]
+    return os.path.join(cache_dir, f"{os.path.basename(source)}.{key}.{np.dtype(dtype).name}")
+
+
+def ensure_cache(source, dtype=np.float32, cache_dir=CACHE_DIR):
+    """Return the cache directory for ``source``, (re)building it when stale."""
+    source = os.path.abspath(source)
+    target = cache_target(source, dtype, cache_dir)
+    manifest = _read_manifest(target)
+    st = os.stat(source)
+    # A truncated path hash could collide: only this source's cache is reused
+    if manifest is not None and manifest.get('source') == source:
+        if (manifest['size'], manifest['mtime_ns']) == (st.st_size, st.st_mtime_ns):
+            return target
+        if manifest['size'] == st.st_size and manifest['sha256'] == file_hash(source):
+            # Touched but unchanged: remember the new mtime and keep the arrays
+            manifest['mtime_ns'] = st.st_mtime_ns
+            with open(os.path.join(target, MANIFEST), 'w') as f:
+                json.dump(manifest, f, indent=2)
+            return target
+    os.makedirs(cache_dir, exist_ok=True)
+    build(source, target, dtype)
+    return target
+
+
+class CachedDataset:
+    """Read-only, memory-mapped view of one cached CSV."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.manifest = _read_manifest(directory)
+        self.n_rows = self.manifest['n_rows']
+        self.sha256 = self.manifest['sha256']
+        self.classes = self.manifest['classes']
+        self.columns = {
+            name: np.load(os.path.join(directory, filename), mmap_mode='r')
+            for name, filename in self.manifest['columns'].items()
+        }
+        labels_path = os.path.join(directory, 'labels.npy')
+        self.labels = np.load(labels_path, mmap_mode='r') if self.classes is not None else None
+
+    def __len__(self):
+        return self.n_rows
+
+    def matrix(self, columns, start=0, stop=None, out=None):
+        """Rows [start, stop) of ``columns`` as an (n, k) float64 block.
+
+        This is the only copy: straight from the page cache into ``out``.
+        """
+        stop = self.n_rows if stop is None else min(stop, self.n_rows)
+        if out is None:
+            out = np.empty((stop - start, len(columns)))
+        for j, name in enumerate(columns):
+            out[:, j] = self.columns[name][start:stop]
+        return out
+
+    def iter_blocks(self, columns, block_rows):
+        out = None
+        for start in range(0, self.n_rows, block_rows):
+            n = min(block_rows, self.n_rows - start)
+            if out is None or out.shape[0] != n:
+                out = np.empty((n, len(columns)))
+            yield start, self.matrix(columns, start, start + n, out=out)
+
+
+def open_dataset(source, dtype=np.float32):
+    """Open ``source`` (a CSV path) through the cache, rebuilding it if needed."""
+    return CachedDataset(ensure_cache(source, dtype))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('sources', nargs='+')
+    parser.add_argument('--dtype', default='float32', choices=['float32', 'float64'])
+    args = parser.parse_args(argv)
+    for source in args.sources:
+        ds = open_dataset(source, np.dtype(args.dtype))
+        print(f"{source}: {ds.n_rows} rows, {len(ds.columns)} columns, "
+              f"classes={ds.classes} -> {ds.directory}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,312 @@
+"""Constant-memory drift monitoring of scored inputs against the training data.
+
+Every scored feature row is folded into fixed-size sketches:
+
+- lifetime running moments (count and sums of the standardized values and
+  their squares), min and max;
+- exponentially decayed moments and a decayed histogram of the recent rows.
+  The histogram's bins are the training deciles plus one slot below the
+  training minimum and one above the maximum, so it doubles as a quantile
+  sketch and directly gives the population stability index (PSI).
+
+Nothing per row is kept, so memory is the same after ten rows and after ten
+million. One row costs a few vectorized NumPy operations (microseconds), and
+a chunk from bulk scoring costs the same operations over the whole chunk.
+
+There are two spaces, because the apps score either kind of row:
+
+- ``'raw'``: data.csv measurements plus I0_log (folded model, bulk scoring);
+- ``'scaled'``: the standardized features of preprocessed_data.csv.
+
+Alerts:
+
+- ``out_of_range``: the share of recent rows outside the training range;
+  ``observe`` also returns the per-row, per-feature mask so the app can warn
+  about the row at hand;
+- ``drift``: the PSI of a feature's recent histogram against the training
+  histogram;
+- ``mean_shift``: the recent mean moved by more than a threshold, measured
+  in training standard deviations.
+
+Usage:
+    python drift.py measurements.csv
+"""
+import argparse
+import json
+import math
+import os
+import threading
+
+import numpy as np
+
+from features import FEATURE_COLUMNS, RAW_COLUMNS, add_log_feature
+from model_provider import BASE_DIR
+from running_stats import histogram_quantiles
+
+SOURCES = {'raw': os.path.join(BASE_DIR, 'data.csv'), 'scaled': os.path.join(BASE_DIR, 'preprocessed_data.csv')}
+QUANTILES = np.linspace(0.1, 0.9, 9)
+HALF_LIFE = 500
+MIN_ROWS = 30
+PSI_ALERT = 0.25
+MEAN_SHIFT_ALERT = 1.0
+OUT_OF_RANGE_ALERT = 0.05
+# Weights of new rows grow instead of old ones decaying; everything is
+# rescaled before the growth factor could lose precision
+MAX_WEIGHT = 1e12
+EPS = 1e-4
+
+
+class Reference:
+    """Training-data statistics that the sketches are compared with."""
+
+    def __init__(self, X, columns=FEATURE_COLUMNS, source=None):
+        X = np.asarray(X, dtype=np.float64)
+        X = X[np.isfinite(X).all(axis=1)]
+        self.columns = list(columns)
+        self.source = source
+        self.n_rows = len(X)
+        self.mean = X.mean(axis=0)
+        std = X.std(axis=0)
+        self.std = np.where(std > 0, std, 1.0)
+        self.min = X.min(axis=0)
+        self.max = X.max(axis=0)
+        # (n_features, n_edges): training min, deciles, training max
+        self.edges = np.column_stack([self.min, np.quantile(X, QUANTILES, axis=0).T, self.max])
+        self.n_slots = self.edges.shape[1] + 1
+        self._cmp_edges = self.edges.copy()
+        self._cmp_edges[:, -1] = np.nextafter(self.max, np.inf)
+        counts = np.zeros((len(self.columns), self.n_slots))
+        bins = self.bins(X)
+        for f in range(len(self.columns)):
+            counts[f] = np.bincount(bins[:, f], minlength=self.n_slots)
+        self.proportions = counts / max(self.n_rows, 1)
+
+    @classmethod
+    def from_dataset(cls, space):
+        """Statistics of the training CSV for ``space``, read through the dataset cache."""
+        from dataset_cache import open_dataset
+
+        source = SOURCES[space]
+        dataset = open_dataset(source, dtype=np.float64)
+        if space == 'raw':
+            X = add_log_feature(dataset.matrix(RAW_COLUMNS))
+        else:
+            X = dataset.matrix(FEATURE_COLUMNS)
+        return cls(X, source=source)
+
+    def bins(self, X):
+        """Slot of every value: 0 below the training min, n_slots - 1 above the max."""
+        # One broadcast comparison for all features at once, no per-feature
+        # loop. The max itself belongs to the last regular bin.
+        return np.count_nonzero(X[:, :, None] >= self._cmp_edges, axis=2)
+
+
+class DriftMonitor:
+    def __init__(self, reference, half_life=HALF_LIFE):
+        self.reference = reference
+        self.half_life = half_life
+        self._growth = 2.0 ** (1.0 / half_life)
+        # Rows per slice whose weight growth stays below MAX_WEIGHT
+        self._max_slice = max(1, int(math.log(MAX_WEIGHT) / math.log(self._growth)))
+        self._offsets = np.arange(len(reference.columns)) * reference.n_slots
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        n_features = len(self.reference.columns)
+        with self._lock:
+            # Row 0: lifetime [count, sum z, sum z^2] of the standardized rows;
+            # row 1: the same, decayed, in units of the current row weight
+            self._sums = np.zeros((2, 1 + 2 * n_features))
+            self._hist = np.zeros((n_features, self.reference.n_slots))
+            self._weight = 1.0
+            self.mins = np.full(n_features, np.inf)
+            self.maxs = np.full(n_features, -np.inf)
+            self.out_of_range = np.zeros(n_features, dtype=np.int64)
+            self.rows_out_of_range = 0
+            self.rejected = 0
+
+    def observe(self, X):
+        """Fold rows into the sketches. Returns their (n, n_features) out-of-range mask.
+
+        Non-finite values (e.g. I0_log of I0 <= -1) count as out of range and
+        their rows are left out of the sketches.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if len(X) == 0:
+            return np.zeros(X.shape, dtype=bool)
+        ref = self.reference
+        bins = ref.bins(X)
+        # NaN and -inf land in the bottom slot, +inf in the top one
+        outside = (bins == 0) | (bins == ref.n_slots - 1)
+        ok = np.isfinite(X).all(axis=1)
+        n_rejected = len(ok) - int(np.count_nonzero(ok))
+        if n_rejected:
+            X, bins = X[ok], bins[ok]
+        n, n_features = X.shape
+        # [1, z, z^2] per row, so one product updates count and both moments
+        feats = np.empty((n, 1 + 2 * n_features))
+        feats[:, 0] = 1.0
+        z = feats[:, 1:n_features + 1]
+        np.subtract(X, ref.mean, out=z)
+        z /= ref.std
+        np.multiply(z, z, out=feats[:, n_features + 1:])
+        with self._lock:
+            self.out_of_range += outside.sum(axis=0) if len(outside) > 1 else outside[0]
+            self.rows_out_of_range += int(np.count_nonzero(outside.any(axis=1)))
+            self.rejected += n_rejected
+            if n == 1:
+                np.minimum(self.mins, X[0], out=self.mins)
+                np.maximum(self.maxs, X[0], out=self.maxs)
+                self._add_row(feats[0], bins[0])
+            elif n:
+                np.minimum(self.mins, X.min(axis=0), out=self.mins)
+                np.maximum(self.maxs, X.max(axis=0), out=self.maxs)
+                for start in range(0, n, self._max_slice):
+                    stop = start + self._max_slice
+                    self._add(feats[start:stop], bins[start:stop])
+        return outside
+
+    def on_chunk(self, chunk, result=None):
+        """Callback for ``batch_scoring.score_csv`` / ``score_dataset`` (raw rows)."""
+        raw = chunk[RAW_COLUMNS].to_numpy(dtype=np.float64) if hasattr(chunk, 'columns') else chunk
+        self.observe(add_log_feature(raw))
+
+    def _add_row(self, feats, bins):
+        # The interactive path: no temporaries beyond the row itself
+        w = self._weight
+        self._sums[0] += feats
+        self._sums[1] += w * feats
+        self._hist.ravel()[self._offsets + bins] += w
+        self._weight = w * self._growth
+        self._maybe_rescale()
+
+    def _add(self, feats, bins):
+        n, n_features = bins.shape
+        w = self._weight * self._growth ** np.arange(n)
+        self._sums[0] += feats.sum(axis=0)
+        self._sums[1] += w @ feats
+        flat = (self._offsets + bins).ravel()
+        self._hist += np.bincount(flat, weights=np.repeat(w, n_features),
+                                  minlength=self._hist.size).reshape(self._hist.shape)
+        self._weight = w[-1] * self._growth
+        self._maybe_rescale()
+
+    def _maybe_rescale(self):
+        if self._weight > MAX_WEIGHT:
+            scale = 1.0 / self._weight
+            self._sums[1] *= scale
+            self._hist *= scale
+            self._weight = 1.0
+
+    def quantiles(self, qs=(0.25, 0.5, 0.75)):
+        """(n_features, len(qs)) recent quantiles, interpolated in the histogram bins."""
+        with self._lock:
+            hist, mins, maxs = self._hist.copy(), self.mins.copy(), self.maxs.copy()
+        edges = self.reference.edges
+        return np.array([histogram_quantiles(hist[f], edges[f], mins[f], maxs[f], qs) for f in range(len(edges))])
+
+    def status(self):
+        """Per-feature statistics and the active alerts, JSON-ready."""
+        ref = self.reference
+        n_features = len(ref.columns)
+        with self._lock:
+            sums, hist = self._sums.copy(), self._hist.copy()
+            # Decayed row count with the newest row weighing 1: at most about
+            # 1.44 half-lives
+            recent_rows = sums[1, 0] * self._growth / self._weight
+            out_of_range = self.out_of_range.copy()
+            rows_out_of_range, rejected = self.rows_out_of_range, self.rejected
+        count, w = sums[:, 0]
+        features = {}
+        alerts = []
+        if count:
+            # Means and stds in training standard deviations
+            mean = sums[:, 1:n_features + 1] / sums[:, :1]
+            std = np.sqrt(np.maximum(sums[:, n_features + 1:] / sums[:, :1] - mean ** 2, 0.0))
+            p = hist / w
+            psi = ((p - ref.proportions) * np.log((p + EPS) / (ref.proportions + EPS))).sum(axis=1)
+            recent_outside = p[:, 0] + p[:, -1]
+            for f, name in enumerate(ref.columns):
+                features[name] = {
+                    'psi': float(psi[f]),
+                    'mean_shift': float(mean[1, f]),
+                    'std_ratio': float(std[1, f]),
+                    'recent_out_of_range': float(recent_outside[f]),
+                    'out_of_range': int(out_of_range[f]),
+                    'lifetime_mean': float(ref.mean[f] + ref.std[f] * mean[0, f]),
+                    'lifetime_std': float(ref.std[f] * std[0, f]),
+                }
+                if recent_outside[f] >= OUT_OF_RANGE_ALERT:
+                    alerts.append({'kind': 'out_of_range', 'feature': name, 'value': float(recent_outside[f]),
+                                   'threshold': OUT_OF_RANGE_ALERT})
+                if recent_rows < MIN_ROWS:
+                    continue
+                if psi[f] >= PSI_ALERT:
+                    alerts.append({'kind': 'drift', 'feature': name, 'value': float(psi[f]), 'threshold': PSI_ALERT})
+                if abs(mean[1, f]) >= MEAN_SHIFT_ALERT:
+                    alerts.append({'kind': 'mean_shift', 'feature': name, 'value': float(mean[1, f]),
+                                   'threshold': MEAN_SHIFT_ALERT})
+        return {
+            'source': ref.source and os.path.basename(ref.source),
+            'rows': int(count) + rejected,
+            'recent_rows': float(recent_rows),
+            'rows_out_of_range': rows_out_of_range,
+            'rejected': rejected,
+            'features': features,
+            'alerts': alerts,
+        }
+
+
+_monitors = {}
+_monitors_lock = threading.Lock()
+
+
+def get_drift_monitor(space='raw'):
+    """Return the process-wide monitor for ``space`` ('raw' or 'scaled')."""
+    monitor = _monitors.get(space)
+    if monitor is not None:
+        return monitor
+    with _monitors_lock:
+        if space not in _monitors:
+            _monitors[space] = DriftMonitor(Reference.from_dataset(space))
+        return _monitors[space]
+
+
+def active_monitors():
+    """The monitors created so far, by space."""
+    return dict(_monitors)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('inputs', nargs='+', help="CSV files in the data.csv layout (Class optional)")
+    parser.add_argument('--chunksize', type=int, default=10_000)
+    parser.add_argument('--half-life', type=int, default=HALF_LIFE, help="rows after which a row's weight halves")
+    parser.add_argument('-o', '--output', help="write the status as JSON to this file")
+    args = parser.parse_args(argv)
+
+    import pandas as pd
+
+    from batch_scoring import chunk_features
+
+    monitor = DriftMonitor(Reference.from_dataset('raw'), half_life=args.half_life)
+    for path in args.inputs:
+        for chunk in pd.read_csv(path, chunksize=args.chunksize):
+            monitor.observe(chunk_features(chunk))
+    status = monitor.status()
+    for alert in status['alerts']:
+        print(f"ALERT {alert['kind']}: {alert['feature']} = {alert['value']:.3f} (threshold {alert['threshold']})")
+    print(f"{status['rows']} rows, {status['rows_out_of_range']} outside the training range, "
+          f"{len(status['alerts'])} alerts")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(status, f, indent=2)
+    if status['alerts']:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
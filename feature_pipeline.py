@@ -0,0 +1,246 @@
+"""The training feature pipeline and its folded, raw-input form.
+
+The model in mlops.ipynb is trained on
+``raw columns -> I0_log = log(I0 + 1) -> StandardScaler (all data) ->
+StandardScaler (train split)``. The scalers are affine maps, so they compose
+into one ``(x - mean) / scale`` and that can be absorbed into the linear
+weights::
+
+    ((x - M) / S) @ W + b  ==  x @ (W / S) + (b - (M / S) @ W)
+
+A ``FoldedLinearModel`` therefore scores raw data.csv rows with one
+vectorized log and one matmul. No scaled copy of the input is made.
+"""
+import threading
+
+import numpy as np
+
+from features import FEATURE_COLUMNS, RAW_COLUMNS, add_log_feature
+from inference import LinearInferenceEngine, ParityError
+from model_provider import FOLDED_MODEL_PATH, PIPELINE_PATH, save_model
+
+
+class FeaturePipeline:
+    """Raw data.csv columns -> model input, as done in the notebook.
+
+    ``steps`` is a list of (mean, scale) pairs applied in order, taken from
+    fitted ``StandardScaler`` objects.
+    """
+
+    def __init__(self, steps, label_classes=None):
+        self.steps = [(np.asarray(m, dtype=np.float64), np.asarray(s, dtype=np.float64)) for m, s in steps]
+        self.label_classes = None if label_classes is None else np.asarray(label_classes)
+
+    @classmethod
+    def from_scalers(cls, scalers, label_classes=None):
+        steps = []
+        for scaler in scalers:
+            n = scaler.n_features_in_
+            mean = scaler.mean_ if scaler.with_mean else np.zeros(n)
+            scale = scaler.scale_ if scaler.with_std else np.ones(n)
+            steps.append((mean, scale))
+        return cls(steps, label_classes)
+
+    def combined(self):
+        """Collapse all steps into a single (mean, scale) pair."""
+        mean = np.zeros(len(FEATURE_COLUMNS))
+        scale = np.ones(len(FEATURE_COLUMNS))
+        for m, s in self.steps:
+            # ((x - mean) / scale - m) / s == (x - (mean + m * scale)) / (scale * s)
+            mean = mean + m * scale
+            scale = scale * s
+        return mean, scale
+
+    def transform(self, raw):
+        X = add_log_feature(raw)
+        for m, s in self.steps:
+            X -= m
+            X /= s
+        return X
+
+
+class FoldedLinearModel:
+    """Linear classifier whose weights already include the feature scaling.
+
+    Takes the nine raw columns (``RAW_COLUMNS``). I0_log is derived into a
+    per-thread buffer and the rest is one pass of ``LinearInferenceEngine``.
+    """
+
+    raw_input = True
+
+    def __init__(self, coef, intercept, classes, ovr=False, label_classes=None, center=None, dtype=np.float64):
+        self.engine = LinearInferenceEngine(coef, intercept, classes, ovr=ovr, dtype=dtype)
+        # The combined pipeline mean: explanations are taken relative to it
+        self.center = None if center is None else np.asarray(center, dtype=np.float64)
+        self.classes_ = self.engine.classes_
+        self.label_classes = None if label_classes is None else np.asarray(label_classes)
+        self._local = threading.local()
+
+    @classmethod
+    def fold(cls, model, pipeline):
+        base = LinearInferenceEngine.from_sklearn(model)
+        mean, scale = pipeline.combined()
+        W = base.W / scale[:, None]
+        b = base.b - (mean / scale) @ base.W
+        return cls(W.T, b, base.classes_, ovr=base.ovr, label_classes=pipeline.label_classes, center=mean)
+
+    def __getstate__(self):
+        # Only plain arrays are pickled, so joblib can memory-map them. The
+        # transposed view keeps W's memory layout: a mapped coef becomes the
+        # engine's W again without a copy.
+        return {
+            'coef': self.engine.W.T,
+            'intercept': self.engine.b,
+            'classes': self.classes_,
+            'ovr': self.engine.ovr,
+            'label_classes': self.label_classes,
+            'center': self.center,
+            'dtype': self.engine.dtype.str,
+        }
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def astype(self, dtype):
+        """Return a copy that scores in ``dtype`` (e.g. float32 for batch throughput)."""
+        if np.dtype(dtype) == self.engine.dtype:
+            return self
+        state = self.__getstate__()
+        state['dtype'] = dtype
+        return type(self)(**state)
+
+    def _features(self, raw):
+        raw = np.asarray(raw, dtype=np.float64)
+        if raw.ndim == 1:
+            raw = raw.reshape(1, -1)
+        if raw.shape[1] != len(RAW_COLUMNS):
+            raise ValueError(f"Expected {len(RAW_COLUMNS)} raw columns, got {raw.shape[1]}")
+        buf = getattr(self._local, 'X', None)
+        if buf is None or buf.shape[0] < raw.shape[0]:
+            buf = self._local.X = np.empty((raw.shape[0], len(FEATURE_COLUMNS)))
+        return add_log_feature(raw, out=buf[:raw.shape[0]])
+
+    def predict_proba(self, raw):
+        return self.engine.predict_proba(self._features(raw))
+
+    def predict(self, raw):
+        return self.engine.predict(self._features(raw))
+
+    def score(self, raw):
+        return self.engine.score(self._features(raw))
+
+    def explain(self, raw):
+        """Per-feature logit contributions over the ten model features (see inference.py)."""
+        return self.engine.explain(self._features(raw), center=self.center)
+
+
+class PipelineScorer:
+    """Raw data.csv rows -> ``pipeline`` -> a scorer trained on scaled features.
+
+    For models that cannot be folded (forests, SVMs) or when only the scaled
+    model is at hand. ``explain`` is offered when the wrapped scorer has it.
+    """
+
+    raw_input = True
+
+    def __init__(self, pipeline, scorer):
+        self.pipeline = pipeline
+        self.scorer = scorer
+        self.classes_ = scorer.classes_
+        self.label_classes = pipeline.label_classes
+        if hasattr(scorer, 'explain'):
+            self.explain = lambda raw: scorer.explain(pipeline.transform(raw))
+
+    def predict_proba(self, raw):
+        return self.scorer.predict_proba(self.pipeline.transform(raw))
+
+    def score(self, raw):
+        return self.scorer.score(self.pipeline.transform(raw))
+
+
+def load_pipeline():
+    """The FeaturePipeline of the active registry version (else feature_pipeline.pkl), or None."""
+    from model_registry import get_registry_provider
+
+    provider = get_registry_provider('pipeline')
+    if not provider.exists():
+        return None
+    obj = provider.get().model
+    # feature_pipeline.pkl holds a dict with the pipeline and the model
+    return obj['pipeline'] if isinstance(obj, dict) else obj
+
+
+def check_folded(folded, model, pipeline, raw, rtol=1e-6, atol=1e-9):
+    """Raise ParityError unless ``folded`` matches ``model`` on ``pipeline`` output."""
+    expected = model.predict_proba(pipeline.transform(raw))
+    actual = folded.predict_proba(raw)
+    if not np.allclose(actual, expected, rtol=rtol, atol=atol):
+        raise ParityError("Folded model does not match the scaled pipeline")
+
+
+def build_folded(model, scalers, label_classes, sample_raw):
+    """Return (pipeline, folded model) without saving anything.
+
+    ``sample_raw`` is an (n, 9) block of raw rows (e.g. data.csv) used to
+    check the folded model against the unfolded pipeline. The folded model is
+    None when ``model`` is not linear.
+    """
+    pipeline = FeaturePipeline.from_scalers(scalers, label_classes)
+    if not hasattr(model, 'coef_'):
+        return pipeline, None
+    folded = FoldedLinearModel.fold(model, pipeline)
+    check_folded(folded, model, pipeline, sample_raw)
+    return pipeline, folded
+
+
+def export_pipeline(model, scalers, label_classes, sample_raw,
+                    pipeline_path=PIPELINE_PATH, folded_path=FOLDED_MODEL_PATH):
+    """Save the feature pipeline and, for linear models, the folded artifact.
+
+    Returns the folded model, or None when ``model`` is not linear.
+    """
+    pipeline, folded = build_folded(model, scalers, label_classes, sample_raw)
+    save_model({
+        'raw_columns': RAW_COLUMNS,
+        'feature_columns': FEATURE_COLUMNS,
+        'pipeline': pipeline,
+        'model': model,
+    }, pipeline_path)
+    if folded is not None:
+        save_model(folded, folded_path)
+    return folded
+
+
+def check_published(registry, version, model, pipeline, sample_raw, rtol=1e-6, atol=1e-9):
+    """Raise ParityError unless the stored artifacts of ``version`` score ``sample_raw`` like ``model``.
+
+    Loads the model and pipeline the way the apps and batch_scoring.py do
+    (snapshots, compiled scorer, ``PipelineScorer``), so a forest or SVM
+    winner exercises the same raw-row path as a linear one.
+    """
+    from model_provider import ModelSnapshot
+
+    loaded = {}
+    for artifact in ('model', 'pipeline'):
+        path = registry.artifact_path(version, artifact)
+        loaded[artifact] = ModelSnapshot(registry.load(version, artifact), version, path, 0.0)
+    scorer = PipelineScorer(loaded['pipeline'].model, loaded['model'].scorer)
+    expected = model.predict_proba(pipeline.transform(sample_raw))
+    if not np.allclose(scorer.predict_proba(sample_raw), expected, rtol=rtol, atol=atol):
+        raise ParityError(f"Published {version} does not reproduce {type(model).__name__} on raw rows")
+
+
+def publish_model(model, scalers, label_classes, sample_raw, data_hash=None, metrics=None, registry=None):
+    """Publish ``model`` with its pipeline and folded form as a new registry version.
+
+    The version is activated only after ``check_published`` passes.
+    """
+    from model_registry import ModelRegistry
+
+    pipeline, folded = build_folded(model, scalers, label_classes, sample_raw)
+    registry = registry or ModelRegistry()
+    version = registry.publish(model, folded=folded, pipeline=pipeline, data_hash=data_hash, metrics=metrics,
+                               activate=False)
+    check_published(registry, version, model, pipeline, sample_raw)
+    registry.activate(version)
+    return version
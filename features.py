@@ -0,0 +1,37 @@
+"""Feature layout shared by the apps, bulk scoring and training code."""
+import numpy as np
+
+# Raw measurement columns as exported in data.csv
+RAW_COLUMNS = ['I0', 'PA500', 'HFS', 'DA', 'Area', 'A.DA', 'Max.IP', 'DR', 'P']
+
+# Model input order: the raw columns plus the derived I0_log
+FEATURE_COLUMNS = RAW_COLUMNS + ['I0_log']
+
+# Map model output to tumor classes (same mapping as the apps)
+class_mapping = {0: "Carcinoma", 1: "Fibro-adenoma", 2: "Mastopathy", 3: "Glandular", 4: "Connective", 5: "Adipose"}
+
+# data.csv class codes. Models published with a pipeline number their classes
+# in LabelEncoder order of these codes (``label_classes``), not as above.
+LABEL_NAMES = {'car': "Carcinoma", 'fad': "Fibro-adenoma", 'mas': "Mastopathy", 'gla': "Glandular",
+               'con': "Connective", 'adi': "Adipose"}
+
+
+def class_names(label_classes=None):
+    """Display name per class id: from the model's ``label_classes`` when known, else ``class_mapping``."""
+    if label_classes is None:
+        return [class_mapping[i] for i in sorted(class_mapping)]
+    return [LABEL_NAMES.get(str(code), str(code)) for code in label_classes]
+
+
+def add_log_feature(raw, out=None):
+    """Append I0_log = log(I0 + 1) to an (n, 9) block of raw columns.
+
+    Writes into ``out`` when given so callers can reuse one buffer per chunk.
+    """
+    raw = np.asarray(raw, dtype=np.float64)
+    n = raw.shape[0]
+    if out is None:
+        out = np.empty((n, len(FEATURE_COLUMNS)), dtype=np.float64)
+    out[:, :len(RAW_COLUMNS)] = raw
+    np.log1p(raw[:, 0], out=out[:, len(RAW_COLUMNS)])
+    return out
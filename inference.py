@@ -0,0 +1,304 @@
+"""Single-pass NumPy inference for the saved models.
+
+sklearn's ``predict`` and ``predict_proba`` each validate the input and
+evaluate the linear model again. The engine here extracts ``coef_`` and
+``intercept_`` once into a contiguous weight matrix and gets the logits, the
+softmax probabilities and the argmax class from a single matmul into reused
+buffers.
+
+Random forests get a ``ForestInferenceEngine``: every tree is flattened into
+shared node arrays and a batch walks all trees at once, one tree level per
+vectorized step, instead of sklearn's per-tree Python dispatch.
+
+Every engine is checked against sklearn when it is compiled. If the outputs
+differ, ``compile_model`` falls back to a thin wrapper around the sklearn
+estimator, so callers always get the same ``score`` interface.
+"""
+import threading
+
+import numpy as np
+
+
+class ParityError(ValueError):
+    pass
+
+
+class SklearnScorer:
+    """Fallback with the engine interface, backed by the estimator itself."""
+
+    def __init__(self, model):
+        self.model = model
+        self.classes_ = model.classes_
+
+    def predict_proba(self, X):
+        return self.model.predict_proba(X)
+
+    def score(self, X):
+        proba = self.model.predict_proba(X)
+        best = proba.argmax(axis=1)
+        return self.classes_[best], proba[np.arange(len(best)), best]
+
+
+class LinearInferenceEngine:
+    """Fused ``X @ W + b`` -> softmax -> argmax for a fitted linear classifier.
+
+    ``W`` is stored as a C-contiguous (n_features, n_classes) matrix so the
+    matmul streams over rows of ``X``. Binary models are expanded to two
+    columns with a zero logit for the negative class, which makes softmax
+    identical to sklearn's sigmoid. One-vs-rest models normalise sigmoids
+    instead of taking a softmax.
+    """
+
+    def __init__(self, coef, intercept, classes, ovr=False, dtype=np.float64):
+        coef = np.asarray(coef, dtype=dtype)
+        intercept = np.asarray(intercept, dtype=dtype).reshape(-1)
+        if coef.shape[0] == 1:
+            coef = np.vstack([np.zeros_like(coef), coef])
+            intercept = np.concatenate([np.zeros(1, dtype=dtype), intercept])
+            ovr = False
+        self.W = np.ascontiguousarray(coef.T)
+        self.b = np.ascontiguousarray(intercept)
+        self.classes_ = np.asarray(classes)
+        self.ovr = ovr
+        self.dtype = np.dtype(dtype)
+        self.n_features, self.n_classes = self.W.shape
+        # Streamlit sessions run on separate threads, so each thread gets its
+        # own scratch buffers.
+        self._local = threading.local()
+
+    @classmethod
+    def from_sklearn(cls, model, dtype=np.float64):
+        multi_class = getattr(model, 'multi_class', 'auto')
+        ovr = multi_class == 'ovr' or (multi_class == 'auto' and getattr(model, 'solver', None) == 'liblinear')
+        # SGDClassifier(loss='log_loss') is always one-vs-rest
+        ovr = ovr or getattr(model, 'loss', None) == 'log_loss'
+        return cls(model.coef_, model.intercept_, model.classes_, ovr=ovr, dtype=dtype)
+
+    def _buffer(self, n):
+        buf = getattr(self._local, 'logits', None)
+        if buf is None or buf.shape[0] < n:
+            # Grow geometrically so a run of similar batch sizes reallocates rarely
+            size = max(n, 2 * buf.shape[0] if buf is not None else 1)
+            buf = self._local.logits = np.empty((size, self.n_classes), dtype=self.dtype)
+        return buf[:n]
+
+    def _forward(self, X):
+        X = np.asarray(X, dtype=self.dtype)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got {X.shape[1]}")
+        Z = self._buffer(X.shape[0])
+        np.matmul(X, self.W, out=Z)
+        Z += self.b
+        # The class with the largest logit is also the most probable one
+        best = Z.argmax(axis=1)
+        if self.ovr:
+            np.negative(Z, out=Z)
+            np.exp(Z, out=Z)
+            Z += 1.0
+            np.reciprocal(Z, out=Z)
+        else:
+            Z -= Z.max(axis=1, keepdims=True)
+            np.exp(Z, out=Z)
+        Z /= Z.sum(axis=1, keepdims=True)
+        return Z, best
+
+    def predict_proba(self, X):
+        proba, _ = self._forward(X)
+        return proba.copy()
+
+    def predict(self, X):
+        _, best = self._forward(X)
+        return self.classes_[best]
+
+    def score(self, X):
+        """Return (class labels, confidence of the predicted class)."""
+        proba, best = self._forward(X)
+        return self.classes_[best], proba[np.arange(len(best)), best]
+
+    def explain(self, X, center=None):
+        """Like ``score``, plus the (n, n_features, n_classes) logit contributions.
+
+        For a linear model the logit of class k is ``b_k + sum_j x_j * W_jk``,
+        so ``x_j * W_jk`` is exactly feature j's share. It costs one
+        broadcasted multiply next to the forward pass. ``center`` is
+        subtracted from ``X`` first, so folded models report contributions
+        relative to the training mean like the unfolded model.
+        """
+        X = np.asarray(X, dtype=self.dtype)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        proba, best = self._forward(X)
+        labels, confidence = self.classes_[best], proba[np.arange(len(best)), best]
+        if center is not None:
+            X = X - center
+        return labels, confidence, X[:, :, None] * self.W
+
+
+def top_features(contributions, class_index, k=3):
+    """Indices of the ``k`` features pushing hardest towards ``class_index``, per row.
+
+    ``contributions`` is (n, n_features, n_classes) from ``explain``;
+    ``class_index`` is one column per row, e.g. the predicted class.
+    Returns (indices, values), both (n, k), largest contribution first.
+    """
+    rows = np.arange(contributions.shape[0])
+    chosen = contributions[rows, :, class_index]
+    order = np.argsort(-chosen, axis=1)[:, :k]
+    return order, np.take_along_axis(chosen, order, axis=1)
+
+
+class ForestInferenceEngine:
+    """A fitted random forest compiled into flat, contiguous node arrays.
+
+    The nodes of all trees are concatenated: ``feature``, ``threshold``,
+    ``left``, ``right`` and ``value`` (the leaf class probabilities) hold one
+    entry per node and child links are global indices. Leaves link to
+    themselves, so a batch descends every tree in lock-step, one level per
+    step, and rows that already reached a leaf simply stay there.
+
+    Like sklearn, inputs are compared in float32 against the float64
+    thresholds, and the tree probabilities are averaged in tree order, so
+    ``predict_proba`` matches the forest exactly.
+
+    The lock-step descent gathers (n_trees, n_rows) nodes per level, which
+    beats sklearn's per-tree dispatch only for small batches. Batches of more
+    than ``max_rows`` rows go to the estimator's own ``predict_proba`` when
+    the engine was built with ``from_sklearn``.
+    """
+
+    dtype = np.dtype(np.float64)
+    # Measured crossover is 200-300 rows for 50-100 trees
+    max_rows = 128
+
+    def __init__(self, feature, threshold, left, right, value, missing_left, roots, max_depth, classes, n_features,
+                 model=None):
+        self.feature = np.ascontiguousarray(feature, dtype=np.intp)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self.left = np.ascontiguousarray(left, dtype=np.intp)
+        self.right = np.ascontiguousarray(right, dtype=np.intp)
+        self.value = np.ascontiguousarray(value, dtype=np.float64)
+        self.missing_left = np.ascontiguousarray(missing_left, dtype=bool)
+        self.is_leaf = self.left == np.arange(len(self.left))
+        self.roots = np.ascontiguousarray(roots, dtype=np.intp)
+        self.max_depth = int(max_depth)
+        self.classes_ = np.asarray(classes)
+        self.n_features = n_features
+        self.n_classes = len(self.classes_)
+        self.model = model
+
+    @classmethod
+    def from_sklearn(cls, model):
+        if getattr(model, 'n_outputs_', 1) != 1:
+            raise ValueError("Multi-output forests are not supported")
+        features, thresholds, lefts, rights, values, missing, roots = [], [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            nodes = np.arange(n)
+            leaf = tree.children_left == -1
+            feature = np.where(leaf, 0, tree.feature)
+            # Leaves point at themselves, so extra descent steps are no-ops
+            left = np.where(leaf, nodes, tree.children_left) + offset
+            right = np.where(leaf, nodes, tree.children_right) + offset
+            value = tree.value[:, 0, :]
+            totals = value.sum(axis=1, keepdims=True)
+            value = value / np.where(totals == 0, 1.0, totals)
+            features.append(feature)
+            thresholds.append(tree.threshold)
+            lefts.append(left)
+            rights.append(right)
+            values.append(value)
+            missing.append(getattr(tree, 'missing_go_to_left', np.zeros(n, dtype=np.uint8)).astype(bool))
+            roots.append(offset)
+            max_depth = max(max_depth, tree.max_depth)
+            offset += n
+        return cls(np.concatenate(features), np.concatenate(thresholds), np.concatenate(lefts),
+                   np.concatenate(rights), np.vstack(values), np.concatenate(missing), roots, max_depth,
+                   model.classes_, model.n_features_in_, model=model)
+
+    def _leaves(self, X):
+        """(n_trees, n_rows) leaf index of every row in every tree."""
+        # sklearn's trees compare float32 inputs
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got {X.shape[1]}")
+        rows = np.arange(X.shape[0])
+        node = np.repeat(self.roots[:, None], X.shape[0], axis=1)
+        has_nan = np.isnan(X).any()
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[node]]
+            go_left = x <= self.threshold[node]
+            if has_nan:
+                go_left |= np.isnan(x) & self.missing_left[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+            if self.is_leaf[node].all():
+                break
+        return node
+
+    def predict_proba(self, X):
+        if self.model is not None and len(X) > self.max_rows:
+            X = np.asarray(X)
+            if X.ndim == 2:
+                return self.model.predict_proba(X)
+        node = self._leaves(X)
+        proba = np.zeros((node.shape[1], self.n_classes))
+        for tree_leaves in node:
+            proba += self.value[tree_leaves]
+        proba /= len(self.roots)
+        return proba
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+    def score(self, X):
+        """Return (class labels, confidence of the predicted class)."""
+        proba = self.predict_proba(X)
+        best = proba.argmax(axis=1)
+        return self.classes_[best], proba[np.arange(len(best)), best]
+
+
+def check_parity(engine, model, X=None, rtol=None, atol=None):
+    """Raise ParityError unless ``engine`` reproduces ``model.predict_proba``."""
+    if X is None:
+        rng = np.random.default_rng(0)
+        X = rng.standard_normal((64, engine.n_features))
+    if rtol is None:
+        rtol = 1e-5 if engine.dtype == np.float32 else 1e-9
+    if atol is None:
+        atol = 1e-6 if engine.dtype == np.float32 else 1e-12
+    expected = model.predict_proba(X)
+    actual = engine.predict_proba(X)
+    if actual.shape != expected.shape or not np.allclose(actual, expected, rtol=rtol, atol=atol):
+        raise ParityError(f"{type(engine).__name__} does not match {type(model).__name__}.predict_proba")
+    if not np.array_equal(engine.predict(X), model.predict(X)):
+        raise ParityError(f"{type(engine).__name__} predicts different classes than {type(model).__name__}")
+
+
+def compile_model(model, X=None, dtype=np.float64):
+    """Return the fastest scorer that matches ``model`` exactly, or a fallback."""
+    if getattr(model, 'raw_input', False):
+        # Already a scorer, e.g. a FoldedLinearModel from feature_pipeline.py;
+        # only its precision may change
+        return model.astype(dtype) if hasattr(model, 'astype') else model
+    if hasattr(model, 'coef_') and hasattr(model, 'intercept_') and hasattr(model, 'predict_proba'):
+        try:
+            engine = LinearInferenceEngine.from_sklearn(model, dtype=dtype)
+            check_parity(engine, model, X)
+            return engine
+        except (ParityError, ValueError):
+            pass
+    estimators = getattr(model, 'estimators_', None)
+    if isinstance(estimators, list) and estimators and all(hasattr(e, 'tree_') for e in estimators):
+        try:
+            engine = ForestInferenceEngine.from_sklearn(model)
+            check_parity(engine, model, X, rtol=1e-12, atol=1e-12)
+            return engine
+        except (ParityError, ValueError):
+            pass
+    return SklearnScorer(model)
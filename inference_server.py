@@ -0,0 +1,235 @@
+"""Headless HTTP/JSON inference service with asyncio micro-batching.
+
+Concurrent requests are queued and coalesced into micro-batches of up to
+``max_batch_size`` rows, waiting at most ``max_wait_ms`` for a batch to fill.
+Each batch is scored with one vectorized call of the same model and class
+mapping the Streamlit apps use.
+
+Usage:
+    python inference_server.py --port 8502 --max-batch-size 64 --max-wait-ms 2
+
+Endpoints:
+    POST /predict  {"features": [10 values]} or {"instances": [[10 values], ...]}
+    GET  /health
+    GET  /stats
+"""
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from audit_log import get_audit_log, model_version
+from features import add_log_feature, class_mapping
+from model_provider import get_provider
+from model_registry import get_registry_provider
+
+
+class MicroBatcher:
+    """Coalesces queued requests into batches and scores them off the event loop.
+
+    Scoring, model hot-reloads (``provider.get()``) and audit back-pressure
+    run on a single worker thread, one batch at a time, so the loop keeps
+    accepting connections and answering ``/health`` meanwhile.
+    """
+
+    def __init__(self, provider, max_batch_size=64, max_wait_ms=2.0, audit=None):
+        self.provider = provider
+        self.audit = audit
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue = asyncio.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='scoring')
+        self.batches = 0
+        self.rows = 0
+        self.max_seen_batch = 0
+
+    async def submit(self, rows):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((rows, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            size = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                size += len(item[0])
+            try:
+                await self._score(batch)
+            except Exception as e:
+                # Never let one bad batch stop the loop
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _compute(self, X):
+        # Worker thread: may reload the model, and may wait for room in the
+        # audit buffer, which holds back the next batch (back-pressure)
+        snapshot = self.provider.get()
+        class_ids, confidence = snapshot.scorer.score(X)
+        if self.audit is not None:
+            raw_input = getattr(snapshot.scorer, 'raw_input', False)
+            self.audit.record_many(add_log_feature(X) if raw_input else X, class_ids, confidence,
+                                   model_version(snapshot), source='server', space='raw' if raw_input else 'scaled')
+        return class_ids, confidence
+
+    async def _score(self, batch):
+        loop = asyncio.get_running_loop()
+        try:
+            X = np.concatenate([rows for rows, _ in batch])
+            class_ids, confidence = await loop.run_in_executor(self.executor, self._compute, X)
+        except Exception as e:
+            # Score requests one by one so a malformed request fails alone
+            if len(batch) > 1:
+                for item in batch:
+                    await self._score([item])
+                return
+            batch[0][1].set_exception(e)
+            return
+        self.batches += 1
+        self.rows += len(X)
+        self.max_seen_batch = max(self.max_seen_batch, len(X))
+        start = 0
+        for rows, future in batch:
+            end = start + len(rows)
+            if not future.done():
+                future.set_result([
+                    {'class_id': int(c), 'class': class_mapping[c], 'confidence': float(p)}
+                    for c, p in zip(class_ids[start:end], confidence[start:end])
+                ])
+            start = end
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'rows': self.rows,
+            'mean_batch_size': self.rows / self.batches if self.batches else 0.0,
+            'max_batch_size_seen': self.max_seen_batch,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'queued': self.queue.qsize(),
+        }
+
+
+def parse_rows(payload):
+    if 'instances' in payload:
+        rows = np.asarray(payload['instances'], dtype=np.float64)
+    elif 'features' in payload:
+        rows = np.asarray(payload['features'], dtype=np.float64).reshape(1, -1)
+    else:
+        raise ValueError("Expected 'features' or 'instances'")
+    if rows.ndim != 2 or len(rows) == 0:
+        raise ValueError("'instances' must be a non-empty list of feature lists")
+    return rows
+
+
+class InferenceServer:
+    def __init__(self, provider, max_batch_size=64, max_wait_ms=2.0, audit=None):
+        self.provider = provider
+        self.batcher = MicroBatcher(provider, max_batch_size, max_wait_ms, audit)
+        self.started = time.time()
+
+    async def handle(self, method, path, body):
+        if method == 'GET' and path == '/health':
+            return 200, {'status': 'ok'}
+        if method == 'GET' and path == '/stats':
+            audit = self.batcher.audit
+            return 200, {'uptime_s': time.time() - self.started, 'batcher': self.batcher.stats(),
+                         'model': self.provider.stats(), 'audit': audit.stats() if audit is not None else None}
+        if method == 'POST' and path == '/predict':
+            try:
+                rows = parse_rows(json.loads(body or b'{}'))
+                predictions = await self.batcher.submit(rows)
+            except (ValueError, KeyError) as e:
+                return 400, {'error': str(e)}
+            return 200, {'predictions': predictions}
+        return 404, {'error': f"No route for {method} {path}"}
+
+    async def serve_connection(self, reader, writer):
+        # Minimal HTTP/1.1 with keep-alive; enough for local clients
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0))
+                body = await reader.readexactly(length) if length else b''
+                try:
+                    status, payload = await self.handle(method, path, body)
+                except Exception as e:
+                    status, payload = 500, {'error': str(e)}
+                data = json.dumps(payload).encode()
+                reason = {200: 'OK', 400: 'Bad Request', 404: 'Not Found'}.get(status, 'Internal Server Error')
+                writer.write(
+                    f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=8502):
+        # Load the model before accepting traffic
+        await asyncio.get_running_loop().run_in_executor(self.batcher.executor, self.provider.get)
+        self._batch_task = asyncio.create_task(self.batcher.run())
+        self.server = await asyncio.start_server(self.serve_connection, host, port)
+        return self.server
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self._batch_task.cancel()
+        self.batcher.executor.shutdown(wait=False)
+
+
+async def _serve(args):
+    provider = get_provider(args.model) if args.model else get_registry_provider('model')
+    server = InferenceServer(provider, args.max_batch_size, args.max_wait_ms, get_audit_log())
+    srv = await server.start(args.host, args.port)
+    print(f"Serving on http://{args.host}:{srv.sockets[0].getsockname()[1]} "
+          f"(max batch {args.max_batch_size}, max wait {args.max_wait_ms} ms)")
+    async with srv:
+        await srv.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8502)
+    parser.add_argument('--model', help="model artifact file (default: the registry's active version)")
+    parser.add_argument('--max-batch-size', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=2.0)
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
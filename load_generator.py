@@ -0,0 +1,141 @@
+"""Local load generator for inference_server.py.
+
+Opens ``--concurrency`` keep-alive connections and sends ``--requests``
+single-row predictions, with rows sampled from preprocessed_data.csv. It
+reports p50/p99 latency and throughput.
+
+With ``--sweep``, a server is started in-process for every combination of
+``--batch-sizes`` and ``--waits-ms``, so the effect of the micro-batching
+parameters can be compared in one run:
+
+    python load_generator.py --sweep --batch-sizes 1 16 64 --waits-ms 0 1 5
+    python load_generator.py --url http://127.0.0.1:8502 --concurrency 32
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import statistics
+import time
+from urllib.parse import urlparse
+
+from features import FEATURE_COLUMNS
+from model_provider import BASE_DIR, get_provider
+from model_registry import get_registry_provider
+
+SAMPLE_PATH = os.path.join(BASE_DIR, 'preprocessed_data.csv')
+
+
+def load_sample_rows(path=SAMPLE_PATH):
+    with open(path, newline='') as f:
+        return [[float(row[c]) for c in FEATURE_COLUMNS] for row in csv.DictReader(f)]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    k = (len(values) - 1) * q / 100
+    lo, hi = int(k), min(int(k) + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+async def _client(host, port, bodies, latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for body in bodies:
+            start = time.perf_counter()
+            writer.write(
+                f"POST /predict HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+            status = await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                if line.lower().startswith(b'content-length:'):
+                    length = int(line.split(b':', 1)[1])
+            await reader.readexactly(length)
+            if b' 200 ' not in status:
+                raise RuntimeError(f"Request failed: {status.decode().strip()}")
+            latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+
+async def run_load(host, port, rows, requests=2000, concurrency=32, seed=0):
+    rng = random.Random(seed)
+    bodies = [json.dumps({'features': rng.choice(rows)}).encode() for _ in range(requests)]
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        _client(host, port, bodies[i::concurrency], latencies) for i in range(concurrency)
+    ])
+    elapsed = time.perf_counter() - start
+    return {
+        'requests': len(latencies),
+        'concurrency': concurrency,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'mean_ms': statistics.fmean(latencies) * 1000,
+        'throughput_rps': len(latencies) / elapsed,
+    }
+
+
+async def sweep(args, rows):
+    from inference_server import InferenceServer
+
+    results = []
+    for max_batch_size in args.batch_sizes:
+        for max_wait_ms in args.waits_ms:
+            provider = get_provider(args.model) if args.model else get_registry_provider('model')
+            server = InferenceServer(provider, max_batch_size, max_wait_ms)
+            srv = await server.start('127.0.0.1', 0)
+            port = srv.sockets[0].getsockname()[1]
+            try:
+                result = await run_load('127.0.0.1', port, rows, args.requests, args.concurrency)
+            finally:
+                await server.stop()
+            result.update(max_batch_size=max_batch_size, max_wait_ms=max_wait_ms,
+                          mean_batch_size=server.batcher.stats()['mean_batch_size'])
+            results.append(result)
+    return results
+
+
+def print_table(results):
+    columns = ['max_batch_size', 'max_wait_ms', 'concurrency', 'mean_batch_size', 'p50_ms', 'p99_ms', 'throughput_rps']
+    columns = [c for c in columns if c in results[0]]
+    print('  '.join(f"{c:>15}" for c in columns))
+    for r in results:
+        print('  '.join(f"{r[c]:>15.2f}" if isinstance(r[c], float) else f"{r[c]:>15}" for c in columns))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8502', help="server to load (ignored with --sweep)")
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--sweep', action='store_true', help="start in-process servers and vary the batch parameters")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 32, 128])
+    parser.add_argument('--waits-ms', type=float, nargs='+', default=[0.0, 1.0, 5.0])
+    parser.add_argument('--model', help="model artifact file (default: the registry's active version)")
+    parser.add_argument('--json', action='store_true', help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    rows = load_sample_rows()
+    if args.sweep:
+        results = asyncio.run(sweep(args, rows))
+    else:
+        url = urlparse(args.url)
+        results = [asyncio.run(run_load(url.hostname, url.port or 80, rows, args.requests, args.concurrency))]
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+"""Per-stage timing of app reruns, aggregated into histograms.
+
+The apps are flat Streamlit scripts, so stages are timed as laps: the script
+calls ``begin_rerun()`` at the top and ``lap('stage')`` after each stage, and
+every lap is the time since the previous one on the same thread (Streamlit
+runs each session's rerun on its own thread). Code that is not a flat script
+uses ``timer('stage')`` as a context manager or ``observe()`` directly.
+
+Histograms are process-wide and shared by every session. They are exported
+as Prometheus text, either to a scrape file (``TUMOR_METRICS_FILE``) or on a
+small HTTP endpoint (``TUMOR_METRICS_PORT``, path ``/metrics``).
+
+Recording is on unless ``TUMOR_METRICS=0``. When it is off, ``lap`` and
+``timer`` return right after one attribute check. Only the standard library
+is imported, so the module costs nothing at cold start.
+"""
+import bisect
+import os
+import threading
+import time
+
+# Bucket upper bounds in milliseconds
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+FILE_INTERVAL = 5.0
+
+
+class Histogram:
+    __slots__ = ('counts', 'count', 'sum', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, ms):
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.sum += ms
+        if ms > self.max:
+            self.max = ms
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (``max`` for the last one)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS_MS, self.counts):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ('metrics', 'stage', 'start')
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, (time.perf_counter() - self.start) * 1000)
+        return False
+
+
+class StageMetrics:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._file_written = 0.0
+
+    def observe(self, stage, ms):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram()
+            histogram.observe(ms)
+
+    def timer(self, stage):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, stage)
+
+    def begin_rerun(self, profile=False):
+        """Start timing this thread's rerun; with ``profile`` also run cProfile."""
+        local = self._local
+        local.profiler = None
+        if profile:
+            import cProfile
+
+            local.profiler = cProfile.Profile()
+            local.profiler.enable()
+        if not self.enabled:
+            return
+        local.start = local.mark = time.perf_counter()
+
+    def lap(self, stage):
+        """Record the time since the previous lap (or ``begin_rerun``) as ``stage``."""
+        if not self.enabled:
+            return
+        local = self._local
+        mark = getattr(local, 'mark', None)
+        now = time.perf_counter()
+        if mark is not None:
+            self.observe(stage, (now - mark) * 1000)
+        local.mark = now
+
+    def end_rerun(self):
+        """Record the total rerun time. Returns the profile text if one was captured."""
+        local = self._local
+        start = getattr(local, 'start', None)
+        if self.enabled and start is not None:
+            self.observe('rerun', (time.perf_counter() - start) * 1000)
+            local.start = local.mark = None
+            self._maybe_write_file()
+        profiler = getattr(local, 'profiler', None)
+        if profiler is None:
+            return None
+        profiler.disable()
+        local.profiler = None
+        return _format_profile(profiler)
+
+    def summary(self):
+        """{stage: {count, mean_ms, p50_ms, p95_ms, max_ms}}, slowest total first."""
+        with self._lock:
+            items = sorted(self._histograms.items(), key=lambda kv: kv[1].sum, reverse=True)
+            return {
+                stage: {
+                    'count': h.count,
+                    'mean_ms': h.sum / h.count,
+                    'p50_ms': h.quantile(0.5),
+                    'p95_ms': h.quantile(0.95),
+                    'max_ms': h.max,
+                }
+                for stage, h in items
+            }
+
+    def prometheus(self, name='tumor_app_stage_seconds'):
+        """The histograms in the Prometheus text exposition format."""
+        lines = [f"# HELP {name} Time spent per stage of an app rerun.", f"# TYPE {name} histogram"]
+        with self._lock:
+            for stage, h in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, n in zip(BUCKETS_MS, h.counts):
+                    cumulative += n
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound / 1000:g}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {h.sum / 1000:.6f}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {h.count}')
+        return '\n'.join(lines) + '\n'
+
+    def write_file(self, path):
+        tmp = f"{path}.tmp-{os.getpid()}"
+        with open(tmp, 'w') as f:
+            f.write(self.prometheus())
+        # Scrapers (e.g. node_exporter's textfile collector) never see a partial file
+        os.replace(tmp, path)
+
+    def _maybe_write_file(self):
+        path = os.environ.get('TUMOR_METRICS_FILE')
+        now = time.monotonic()
+        if path and now - self._file_written >= FILE_INTERVAL:
+            self._file_written = now
+            self.write_file(path)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+def _format_profile(profiler, limit=30):
+    import io
+    import pstats
+
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(limit)
+    return out.getvalue()
+
+
+def serve_metrics(metrics, port, host='127.0.0.1'):
+    """Serve ``/metrics`` on a daemon thread."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != '/metrics':
+                self.send_error(404)
+                return
+            body = metrics.prometheus().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """Return the process-wide StageMetrics, starting the endpoint if configured."""
+    global _metrics
+    if _metrics is not None:
+        return _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            metrics = StageMetrics(enabled=os.environ.get('TUMOR_METRICS', '1') != '0')
+            port = os.environ.get('TUMOR_METRICS_PORT')
+            if port:
+                try:
+                    serve_metrics(metrics, int(port))
+                except OSError:
+                    # Another app process on this machine already serves the port
+                    pass
+            _metrics = metrics
+        return _metrics
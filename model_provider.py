@@ -0,0 +1,226 @@
+"""Process-wide model loading shared by the Streamlit apps.
+
+Streamlit re-executes the app script on every widget change, but imported
+modules stay in ``sys.modules``. Keeping the loaded model here means the
+artifact is unpickled once per process and shared by every session, instead
+of once per rerun.
+
+joblib, numpy and sklearn are only imported when a model is first loaded, so
+importing this module does not slow down an app's first paint.
+"""
+import hashlib
+import io
+import os
+import threading
+import time
+
+from metrics import get_metrics
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MODEL_PATH = os.path.join(BASE_DIR, 'best_model.pkl')
+FOLDED_MODEL_PATH = os.path.join(BASE_DIR, 'folded_model.pkl')
+PIPELINE_PATH = os.path.join(BASE_DIR, 'feature_pipeline.pkl')
+
+
+class ModelSnapshot:
+    """One loaded artifact. Never mutated after creation.
+
+    Callers grab a snapshot at the start of a prediction and use it until the
+    end, so a reload swapping in a new model cannot change the weights under
+    an in-flight request. ``scorer`` is the compiled inference engine for the
+    model (see inference.py), or None for artifacts that are not models,
+    such as the feature pipeline.
+    """
+
+    __slots__ = ('model', 'scorer', 'version', 'label', 'path', 'loaded_at', 'load_seconds')
+
+    def __init__(self, model, version, path, load_seconds, label=None):
+        from inference import compile_model
+
+        self.model = model
+        self.scorer = compile_model(model) if hasattr(model, 'predict_proba') else None
+        self.version = version
+        self.label = label or os.path.basename(path)
+        self.path = path
+        self.loaded_at = time.time()
+        self.load_seconds = load_seconds
+
+
+def _load_bytes(data):
+    import joblib
+
+    return joblib.load(io.BytesIO(data))
+
+
+class ModelProvider:
+    """Loads ``path`` lazily and reloads it when the file on disk changes.
+
+    The file's (mtime, size) is checked at most every ``check_interval``
+    seconds; on a change the content hash decides whether a reload is really
+    needed, so touching the file without changing it costs one hash only.
+    """
+
+    def __init__(self, path=DEFAULT_MODEL_PATH, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._stat_key = None
+        self._last_check = 0.0
+        self.load_count = 0
+        self.last_load_seconds = 0.0
+        self.total_load_seconds = 0.0
+        self.last_error = None
+        self._preload_thread = None
+
+    def preload(self):
+        """Load the model on a background thread, if it is not loaded yet.
+
+        Apps call this after drawing the form, so the first Predict click
+        does not pay for the imports and the unpickling.
+        """
+        if self._snapshot is not None or self._preload_thread is not None or not self.exists():
+            return
+        if os.environ.get('TUMOR_APP_NO_PRELOAD'):
+            return
+        self._preload_thread = threading.Thread(target=self._preload, name='model-preload', daemon=True)
+        self._preload_thread.start()
+
+    def _preload(self):
+        try:
+            self.get()
+        except Exception as e:
+            self.last_error = str(e)
+
+    def get(self):
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._last_check < self.check_interval:
+            return snapshot
+        with self._lock:
+            self._last_check = time.monotonic()
+            self._refresh()
+            return self._snapshot
+
+    def _resolve(self):
+        """Return (path, label) of the artifact to serve, or (None, None) if there is none.
+
+        Raising OSError or ValueError means the answer is not known right now
+        (e.g. metadata being replaced); the last good model is kept then.
+        """
+        return self.path, os.path.basename(self.path)
+
+    def _read(self, path, known_version):
+        """Return (model, version) for ``path``; model is None if unchanged.
+
+        The file is read once and the hash is taken of exactly the bytes that
+        get unpickled, so the version always matches the loaded weights.
+        """
+        with open(path, 'rb') as f:
+            data = f.read()
+        version = hashlib.sha256(data).hexdigest()
+        if version == known_version:
+            return None, version
+        return _load_bytes(data), version
+
+    def _refresh(self):
+        try:
+            path, label = self._resolve()
+        except (OSError, ValueError) as e:
+            self.last_error = str(e)
+            if self._snapshot is not None:
+                return
+            raise
+        if path is None:
+            # There is nothing of this kind to serve (e.g. the active version
+            # has no folded model): never keep serving an older one
+            self._snapshot = None
+            self._stat_key = None
+            raise FileNotFoundError(f"No artifact to serve for {self.path}")
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            if self._snapshot is not None:
+                # Keep serving the last good model while the file is replaced
+                return
+            raise
+        stat_key = (path, st.st_mtime_ns, st.st_size)
+        if self._snapshot is not None and stat_key == self._stat_key:
+            return
+
+        start = time.perf_counter()
+        known_version = self._snapshot.version if self._snapshot is not None else None
+        try:
+            model, version = self._read(path, known_version)
+        except Exception as e:
+            # A half-written file: keep the old model and retry on the next check
+            self.last_error = str(e)
+            if self._snapshot is None:
+                raise
+            return
+        if model is None:
+            self._stat_key = stat_key
+            return
+        elapsed = time.perf_counter() - start
+        get_metrics().observe('model_load', elapsed * 1000)
+
+        # Single reference assignment: readers see either the old snapshot or
+        # the new one, never a mix.
+        self._snapshot = ModelSnapshot(model, version, path, elapsed, label)
+        self._stat_key = stat_key
+        self.last_error = None
+        self.load_count += 1
+        self.last_load_seconds = elapsed
+        self.total_load_seconds += elapsed
+
+    def exists(self):
+        try:
+            path, _ = self._resolve()
+        except (OSError, ValueError):
+            return self._snapshot is not None
+        if path is None:
+            return False
+        return self._snapshot is not None or os.path.exists(path)
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            'path': snapshot.path if snapshot is not None else self.path,
+            'version': f"{snapshot.label}@{snapshot.version[:8]}" if snapshot is not None else None,
+            'load_count': self.load_count,
+            'last_load_ms': self.last_load_seconds * 1000,
+            'total_load_ms': self.total_load_seconds * 1000,
+            'last_error': self.last_error,
+        }
+
+
+def save_model(obj, path):
+    """Dump ``obj`` with joblib and atomically replace ``path``.
+
+    The dump goes to a temporary file first, so a running app never sees a
+    half-written artifact.
+    """
+    import joblib
+
+    path = os.path.join(BASE_DIR, path)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    joblib.dump(obj, tmp)
+    os.replace(tmp, path)
+    return path
+
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def get_provider(path=DEFAULT_MODEL_PATH):
+    """Return the process-wide provider for ``path`` (relative to this directory)."""
+    path = os.path.join(BASE_DIR, path)
+    with _providers_lock:
+        provider = _providers.get(path)
+        if provider is None:
+            provider = _providers[path] = ModelProvider(path)
+        return provider
+
+
+def get_model(path=DEFAULT_MODEL_PATH):
+    return get_provider(path).get().model
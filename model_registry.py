@@ -0,0 +1,283 @@
+"""Local, versioned model registry.
+
+Every publish creates a new immutable version directory next to an
+``ACTIVE`` pointer::
+
+    models/
+        ACTIVE              name of the served version, e.g. "v0003"
+        v0003/
+            model.joblib    the fitted estimator
+            folded.joblib   raw-input FoldedLinearModel (linear models only)
+            pipeline.joblib FeaturePipeline (scalers + label classes)
+            metadata.json   data hash, metrics, feature order, sha256 per file
+
+Artifacts are written uncompressed with joblib. ``folded.joblib`` is opened
+with ``mmap_mode='r'`` and keeps its weights mapped: every process serving
+it shares the same page-cached arrays. The sklearn ``model.joblib`` is
+loaded normally (libsvm cannot score from read-only buffers) and compiled
+into a private engine (inference.py) per process. ``metadata.json``
+is written last, and a version without it is ignored, so readers never pick
+up a half-published version.
+
+Usage:
+    python model_registry.py list
+    python model_registry.py activate v0002
+    python model_registry.py verify
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+
+from model_provider import BASE_DIR, DEFAULT_MODEL_PATH, FOLDED_MODEL_PATH, PIPELINE_PATH, ModelProvider
+
+REGISTRY_DIR = os.path.join(BASE_DIR, 'models')
+ACTIVE = 'ACTIVE'
+METADATA = 'metadata.json'
+ARTIFACTS = {
+    'model': 'model.joblib',
+    'folded': 'folded.joblib',
+    'pipeline': 'pipeline.joblib',
+}
+# Loaded memory-mapped; the folded engine keeps the mapped arrays
+MMAP_ARTIFACTS = {'folded'}
+# Served when no version has been published yet
+LEGACY_PATHS = {
+    'model': DEFAULT_MODEL_PATH,
+    'folded': FOLDED_MODEL_PATH,
+    'pipeline': PIPELINE_PATH,
+}
+
+
+class RegistryError(ValueError):
+    pass
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _write_atomic(path, text):
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, 'w') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class ModelRegistry:
+    def __init__(self, root=REGISTRY_DIR):
+        self.root = os.path.abspath(root)
+
+    def versions(self):
+        """Completely published versions, oldest first."""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if name.startswith('v') and os.path.exists(os.path.join(self.root, name, METADATA))
+        )
+
+    def active_version(self):
+        try:
+            with open(os.path.join(self.root, ACTIVE)) as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return version or None
+
+    def activate(self, version):
+        if version not in self.versions():
+            raise RegistryError(f"Unknown model version {version!r}")
+        _write_atomic(os.path.join(self.root, ACTIVE), version + '\n')
+
+    def metadata(self, version):
+        with open(os.path.join(self.root, version, METADATA)) as f:
+            return json.load(f)
+
+    def artifact_path(self, version, artifact='model'):
+        """Path of ``artifact`` in ``version``, or None if it was not published."""
+        if artifact not in ARTIFACTS:
+            raise RegistryError(f"Unknown artifact {artifact!r}")
+        if artifact not in self.metadata(version)['files']:
+            return None
+        return os.path.join(self.root, version, ARTIFACTS[artifact])
+
+    def _new_version_dir(self):
+        os.makedirs(self.root, exist_ok=True)
+        existing = [int(name[1:]) for name in os.listdir(self.root) if name[:1] == 'v' and name[1:].isdigit()]
+        number = max(existing, default=0) + 1
+        while True:
+            version = f"v{number:04d}"
+            try:
+                # mkdir is atomic, so two concurrent publishers get different versions
+                os.mkdir(os.path.join(self.root, version))
+                return version
+            except FileExistsError:
+                number += 1
+
+    def publish(self, model, folded=None, pipeline=None, data_hash=None, metrics=None, activate=True,
+                source=None):
+        """Store a new version and, by default, make it the active one.
+
+        ``source`` tags the version in its metadata (e.g. ``'online'``), so a
+        publisher can later prune only its own versions.
+        """
+        import joblib
+
+        from features import FEATURE_COLUMNS
+
+        version = self._new_version_dir()
+        directory = os.path.join(self.root, version)
+        files = {}
+        for artifact, obj in (('model', model), ('folded', folded), ('pipeline', pipeline)):
+            if obj is None:
+                continue
+            path = os.path.join(directory, ARTIFACTS[artifact])
+            # No compression: compressed arrays cannot be memory-mapped
+            joblib.dump(obj, path)
+            files[artifact] = {'file': ARTIFACTS[artifact], 'sha256': _sha256(path)}
+
+        metadata = {
+            'version': version,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'model_class': type(model).__name__,
+            'feature_order': FEATURE_COLUMNS,
+            'data_hash': data_hash,
+            'metrics': metrics or {},
+            'source': source,
+            'files': files,
+        }
+        _write_atomic(os.path.join(directory, METADATA), json.dumps(metadata, indent=2))
+        if activate:
+            self.activate(version)
+        return version
+
+    def prune(self, keep=10, source=None):
+        """Delete all but the newest ``keep`` versions; the active one is always kept.
+
+        With ``source`` only versions published with that tag are considered,
+        so e.g. online updates never delete a curated train.py version.
+        Processes that still map a deleted version's files keep their pages
+        until they switch to the active version.
+        """
+        import shutil
+
+        active = self.active_version()
+        versions = self.versions()
+        if source is not None:
+            versions = [v for v in versions if self.metadata(v).get('source') == source]
+        removed = []
+        for version in versions[:-keep] if keep > 0 else versions:
+            if version != active:
+                shutil.rmtree(os.path.join(self.root, version), ignore_errors=True)
+                removed.append(version)
+        return removed
+
+    def verify(self, version, artifact=None):
+        """Raise RegistryError if any (or the given) artifact's checksum is wrong."""
+        files = self.metadata(version)['files']
+        for name, entry in files.items():
+            if artifact is not None and name != artifact:
+                continue
+            path = os.path.join(self.root, version, entry['file'])
+            if _sha256(path) != entry['sha256']:
+                raise RegistryError(f"Checksum mismatch for {version}/{entry['file']}")
+
+    def load(self, version=None, artifact='model'):
+        """Load one artifact of ``version`` (default: the active one)."""
+        import joblib
+
+        version = version or self.active_version()
+        if version is None:
+            raise RegistryError("No active model version")
+        path = self.artifact_path(version, artifact)
+        if path is None:
+            raise RegistryError(f"{version} has no {artifact} artifact")
+        self.verify(version, artifact)
+        return joblib.load(path, mmap_mode='r' if artifact in MMAP_ARTIFACTS else None)
+
+
+class RegistryProvider(ModelProvider):
+    """Serves one artifact of the registry's active version.
+
+    Activating another version swaps the model on the next check, like a
+    changed file does for ``ModelProvider``. Until something is published
+    the legacy single-file artifact is served.
+    """
+
+    def __init__(self, artifact='model', registry=None, check_interval=1.0):
+        super().__init__(LEGACY_PATHS.get(artifact), check_interval)
+        self.artifact = artifact
+        self.registry = registry or ModelRegistry()
+
+    def _resolve(self):
+        version = self.registry.active_version()
+        if version is None:
+            if self.path is None:
+                return None, None
+            return super()._resolve()
+        # Metadata read errors propagate: ModelProvider treats them as transient
+        return self.registry.artifact_path(version, self.artifact), version
+
+    def _read(self, path, known_version):
+        if os.path.dirname(os.path.dirname(path)) != self.registry.root:
+            return super()._read(path, known_version)
+        import joblib
+
+        version = os.path.basename(os.path.dirname(path))
+        checksum = self.registry.metadata(version)['files'][self.artifact]['sha256']
+        if checksum == known_version:
+            return None, checksum
+        self.registry.verify(version, self.artifact)
+        return joblib.load(path, mmap_mode='r' if self.artifact in MMAP_ARTIFACTS else None), checksum
+
+
+_registry_providers = {}
+
+
+def get_registry_provider(artifact='model'):
+    """Return the process-wide provider for ``artifact`` of the active version."""
+    provider = _registry_providers.get(artifact)
+    if provider is None:
+        provider = _registry_providers.setdefault(artifact, RegistryProvider(artifact))
+    return provider
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list', help="show published versions")
+    activate = sub.add_parser('activate', help="serve another version")
+    activate.add_argument('version')
+    verify = sub.add_parser('verify', help="check artifact checksums")
+    verify.add_argument('version', nargs='?')
+    args = parser.parse_args(argv)
+
+    registry = ModelRegistry()
+    if args.command == 'list':
+        active = registry.active_version()
+        for version in registry.versions():
+            meta = registry.metadata(version)
+            metrics = ' '.join(f"{k}={v:.3f}" for k, v in meta['metrics'].items() if isinstance(v, float))
+            marker = '*' if version == active else ' '
+            print(f"{marker} {version}  {meta['created']}  {meta['model_class']:<24} "
+                  f"{', '.join(meta['files'])}  {metrics}")
+    elif args.command == 'activate':
+        registry.activate(args.version)
+        print(f"Active version: {args.version}")
+    else:
+        versions = [args.version] if args.version else registry.versions()
+        for version in versions:
+            registry.verify(version)
+            print(f"{version}: OK")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,337 @@
+"""Incremental model updates from newly labelled measurements.
+
+New rows in the data.csv layout are folded into an online model instead of
+re-running the notebook:
+
+    raw -> I0_log -> preprocess scaler (fixed) -> online scaler -> SGD
+
+The online scaler is a ``StandardScaler`` updated with ``partial_fit`` and
+the classifier is an ``SGDClassifier(loss='log_loss')`` updated with
+``partial_fit``. An update takes a few milliseconds. Every update is
+published as a new registry version tagged ``source='online'``. The online
+scaler is folded into the SGD weights, so the published model is a plain
+linear classifier on the preprocessed features (fast engine, explanations)
+next to its pipeline and folded raw-input model.
+
+A version is activated only if its accuracy on a stratified holdout of
+data.csv, which the online model never trains on, is within
+``--max-accuracy-drop`` of the newest curated (train.py / tune.py) version's
+cross-validated accuracy. Otherwise the curated model keeps serving and the
+online version stays available for ``model_registry.py activate``. Pruning
+only ever deletes online versions.
+
+Online SGD drifts with the order of the rows it sees. ``--retrain-interval``
+therefore refits the same pipeline from scratch over data.csv plus every
+update received so far, on a background thread, and swaps it in.
+
+Usage:
+    python online_update.py new_rows.csv
+    python online_update.py --watch incoming/ --retrain-interval 3600
+"""
+import argparse
+import copy
+import glob
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import SGDClassifier
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+
+from features import RAW_COLUMNS, add_log_feature
+from model_provider import BASE_DIR, save_model
+from model_registry import REGISTRY_DIR, ModelRegistry
+from train import DATA_PATH, TrainingData
+
+STATE_PATH = os.path.join(REGISTRY_DIR, 'online_state.joblib')
+UPDATES_PATH = os.path.join(BASE_DIR, 'labelled_updates.csv')
+BOOTSTRAP_EPOCHS = 20
+KEEP_VERSIONS = 20
+HOLDOUT_FRACTION = 0.2
+MAX_ACCURACY_DROP = 0.02
+SOURCE = 'online'
+
+
+class OnlineModel:
+    """Preprocessing plus a partial_fit-capable linear classifier."""
+
+    def __init__(self, preprocess_scaler, classes):
+        self.preprocess_scaler = preprocess_scaler
+        self.classes = np.asarray(classes)
+        self.scaler = StandardScaler()
+        self.classifier = SGDClassifier(loss='log_loss', random_state=42)
+        self.n_updates = 0
+        self.n_rows = 0
+
+    @classmethod
+    def fit(cls, data, extra=None, epochs=BOOTSTRAP_EPOCHS, seed=42, balance=False, rows=None):
+        """Fit from scratch on ``data`` (a TrainingData) plus ``extra`` rows.
+
+        ``rows`` selects the data.csv rows to train on (default: all). With ``balance`` every epoch streams freshly generated SMOTE-style
+        rows for the minority classes (oversampling.py) into ``partial_fit``.
+        """
+        model = cls(data.preprocess_scaler, data.classes)
+        raw, y = (data.raw, data.y) if rows is None else (data.raw[rows], data.y[rows])
+        if extra is not None and len(extra):
+            extra_raw, extra_y = model.encode(extra)
+            raw, y = np.vstack([raw, extra_raw]), np.concatenate([y, extra_y])
+        X = model.preprocess_scaler.transform(add_log_feature(raw))
+        model.scaler.fit(X)
+        X = model.scaler.transform(X)
+        classes = np.arange(len(model.classes))
+        if balance:
+            from oversampling import Oversampler
+
+            sampler = Oversampler().fit(X, y)
+            for epoch in range(epochs):
+                sampler.random_state = seed + epoch
+                for Xb, yb in sampler.iter_batches(X, y):
+                    model.classifier.partial_fit(Xb, yb, classes=classes)
+            model.n_rows = len(y)
+            return model
+        rng = np.random.default_rng(seed)
+        for _ in range(epochs):
+            order = rng.permutation(len(y))
+            model.classifier.partial_fit(X[order], y[order], classes=classes)
+        model.n_rows = len(y)
+        return model
+
+    def encode(self, frame):
+        """(raw block, class codes) of a data.csv-style frame.
+
+        Raises ValueError for missing columns, unknown classes and values
+        that would not give finite features (NaN, inf, I0 <= -1).
+        """
+        frame = frame.rename(columns=str.strip)
+        missing = [c for c in RAW_COLUMNS + ['Class'] if c not in frame.columns]
+        if missing:
+            raise ValueError(f"Missing columns: {', '.join(missing)}")
+        raw = frame[RAW_COLUMNS].to_numpy(dtype=np.float64)
+        bad = ~np.isfinite(add_log_feature(raw)).all(axis=1)
+        if bad.any():
+            rows = ', '.join(map(str, np.flatnonzero(bad)[:10]))
+            raise ValueError(f"Non-finite values (or I0 <= -1) in rows {rows}")
+        labels = frame['Class'].to_numpy()
+        codes = np.searchsorted(self.classes, labels)
+        codes = np.minimum(codes, len(self.classes) - 1)
+        unknown = self.classes[codes] != labels
+        if unknown.any():
+            raise ValueError(f"Unknown classes: {', '.join(map(str, sorted(set(labels[unknown]))))}")
+        return raw, codes
+
+    def partial_fit(self, frame):
+        """Fold labelled rows into the scaler statistics and the weights.
+
+        The update is applied to copies that replace the live objects only
+        once both steps succeeded, so a rejected frame changes nothing.
+        """
+        raw, y = self.encode(frame)
+        X = self.preprocess_scaler.transform(add_log_feature(raw))
+        scaler = copy.deepcopy(self.scaler)
+        classifier = copy.deepcopy(self.classifier)
+        scaler.partial_fit(X)
+        classifier.partial_fit(scaler.transform(X), y, classes=np.arange(len(self.classes)))
+        self.scaler, self.classifier = scaler, classifier
+        self.n_updates += 1
+        self.n_rows += len(y)
+        return len(y)
+
+    def accuracy(self, raw, y):
+        X = self.scaler.transform(self.preprocess_scaler.transform(add_log_feature(raw)))
+        return float(np.mean(self.classifier.predict(X) == y))
+
+    def folded_classifier(self):
+        """Copy of the classifier with the online scaler folded into its weights.
+
+        It takes the preprocessed features directly, like the curated models
+        take the pipeline output, and compiles to the linear engine.
+        """
+        classifier = copy.deepcopy(self.classifier)
+        classifier.coef_ = self.classifier.coef_ / self.scaler.scale_
+        classifier.intercept_ = self.classifier.intercept_ - classifier.coef_ @ self.scaler.mean_
+        return classifier
+
+    def publish(self, registry, sample_raw, data_hash=None, metrics=None):
+        """Publish the current weights as a new, inactive registry version."""
+        from feature_pipeline import build_folded
+
+        # A copy, so later updates never touch an object that is being written
+        classifier = self.folded_classifier()
+        pipeline, folded = build_folded(classifier, [self.preprocess_scaler], self.classes, sample_raw)
+        return registry.publish(
+            classifier, folded=folded, pipeline=pipeline, data_hash=data_hash,
+            metrics={'online_updates': self.n_updates, 'rows_seen': self.n_rows, **(metrics or {})},
+            activate=False, source=SOURCE,
+        )
+
+
+def read_updates(path=UPDATES_PATH):
+    if not os.path.exists(path):
+        return None
+    return pd.read_csv(path).rename(columns=str.strip)
+
+
+class OnlineUpdater:
+    """Applies updates and runs the periodic full retrain in the background.
+
+    Updates that arrive while a retrain is running are replayed on the
+    retrained model before it is swapped in, so none are lost.
+    """
+
+    def __init__(self, data_path=DATA_PATH, registry=None, updates_path=UPDATES_PATH,
+                 state_path=STATE_PATH, keep_versions=KEEP_VERSIONS, balance=False,
+                 max_accuracy_drop=MAX_ACCURACY_DROP):
+        self.data = TrainingData(data_path)
+        self.balance = balance
+        self.registry = registry or ModelRegistry()
+        self.updates_path = updates_path
+        self.state_path = state_path
+        self.keep_versions = keep_versions
+        self.max_accuracy_drop = max_accuracy_drop
+        self.train_rows, holdout = train_test_split(
+            np.arange(len(self.data.y)), test_size=HOLDOUT_FRACTION, stratify=self.data.y, random_state=42)
+        self.holdout = self.data.raw[holdout], self.data.y[holdout]
+        self._lock = threading.Lock()
+        self._pending = None
+        self._retrain_thread = None
+        self._stop = threading.Event()
+        self.sample_raw = self.data.raw[:1000]
+        if os.path.exists(state_path):
+            import joblib
+
+            self.model = joblib.load(state_path)
+        else:
+            self.model = OnlineModel.fit(self.data, read_updates(updates_path), balance=balance,
+                                         rows=self.train_rows)
+
+    def update(self, frame):
+        """Fold ``frame`` into the model, record it and publish. Returns the version."""
+        start = time.perf_counter()
+        frame = frame.rename(columns=str.strip)
+        with self._lock:
+            # Validates the frame before anything is changed or recorded
+            n = self.model.partial_fit(frame)
+            # Same column order as data.csv, so the updates file stays consistent
+            frame = frame[['Class'] + RAW_COLUMNS]
+            fit_ms = (time.perf_counter() - start) * 1000
+            frame.to_csv(self.updates_path, mode='a', header=not os.path.exists(self.updates_path), index=False)
+            if self._pending is not None:
+                self._pending.append(frame)
+            version = self._publish()
+        print(f"{n} rows folded in {fit_ms:.1f} ms, published {version} "
+              f"in {(time.perf_counter() - start) * 1000:.1f} ms total")
+        return version
+
+    def baseline_accuracy(self):
+        """Cross-validated accuracy of the newest curated version, or None."""
+        for version in reversed(self.registry.versions()):
+            metadata = self.registry.metadata(version)
+            if metadata.get('source') != SOURCE and 'cv_accuracy' in metadata.get('metrics', {}):
+                return metadata['metrics']['cv_accuracy']
+        return None
+
+    def _publish(self):
+        accuracy = self.model.accuracy(*self.holdout)
+        version = self.model.publish(self.registry, self.sample_raw, self.data.data_hash,
+                                     {'holdout_accuracy': accuracy, 'holdout_rows': len(self.holdout[1])})
+        save_model(self.model, self.state_path)
+        baseline = self.baseline_accuracy()
+        if self.registry.active_version() is None and baseline is None:
+            # Nothing curated to protect: the legacy file or nothing is served
+            self.registry.activate(version)
+        elif baseline is not None and accuracy >= baseline - self.max_accuracy_drop:
+            self.registry.activate(version)
+        else:
+            reference = 'no curated version with cv_accuracy' if baseline is None else f"baseline {baseline:.3f}"
+            print(f"{version} not activated: holdout accuracy {accuracy:.3f}, {reference}")
+        self.registry.prune(self.keep_versions, source=SOURCE)
+        return version
+
+    def retrain(self):
+        """Refit from scratch on data.csv plus all updates and swap the result in."""
+        start = time.perf_counter()
+        with self._lock:
+            # Rows recorded from here on are replayed instead of read back
+            updates = read_updates(self.updates_path)
+            self._pending = []
+        model = OnlineModel.fit(self.data, updates, balance=self.balance, rows=self.train_rows)
+        with self._lock:
+            for frame in self._pending:
+                model.partial_fit(frame)
+            self._pending = None
+            model.n_updates = self.model.n_updates
+            self.model = model
+            version = self._publish()
+        print(f"Full retrain on {model.n_rows} rows in {time.perf_counter() - start:.1f} s, published {version}")
+        return version
+
+    def start_retraining(self, interval):
+        def loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.retrain()
+                except Exception as e:
+                    print(f"Full retrain failed: {e}")
+
+        self._retrain_thread = threading.Thread(target=loop, name='full-retrain', daemon=True)
+        self._retrain_thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+def watch(updater, directory, poll_seconds=1.0):
+    """Fold every CSV dropped into ``directory``.
+
+    Applied files move to ``directory/done``, rejected ones to
+    ``directory/failed`` so they can be fixed and dropped in again.
+    """
+    done = os.path.join(directory, 'done')
+    failed = os.path.join(directory, 'failed')
+    os.makedirs(done, exist_ok=True)
+    os.makedirs(failed, exist_ok=True)
+    while True:
+        for path in sorted(glob.glob(os.path.join(directory, '*.csv'))):
+            target = done
+            try:
+                updater.update(pd.read_csv(path))
+            except Exception as e:
+                print(f"Rejected {path}: {e}")
+                target = failed
+            os.replace(path, os.path.join(target, os.path.basename(path)))
+        time.sleep(poll_seconds)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('inputs', nargs='*', help="CSV files with labelled rows in the data.csv layout")
+    parser.add_argument('--data', default=DATA_PATH)
+    parser.add_argument('--watch', help="directory to poll for new CSV files")
+    parser.add_argument('--retrain-interval', type=float, default=0,
+                        help="seconds between background full retrains (0 = never)")
+    parser.add_argument('--balance', action='store_true',
+                        help="stream SMOTE-style minority rows into full refits")
+    parser.add_argument('--retrain-now', action='store_true', help="run one full retrain and exit")
+    parser.add_argument('--max-accuracy-drop', type=float, default=MAX_ACCURACY_DROP,
+                        help="activate an online version only within this much of the curated cv_accuracy")
+    args = parser.parse_args(argv)
+
+    updater = OnlineUpdater(args.data, balance=args.balance, max_accuracy_drop=args.max_accuracy_drop)
+    for path in args.inputs:
+        updater.update(pd.read_csv(path))
+    if args.retrain_now:
+        updater.retrain()
+    if args.watch:
+        if args.retrain_interval:
+            updater.start_retraining(args.retrain_interval)
+        try:
+            watch(updater, args.watch)
+        except KeyboardInterrupt:
+            updater.stop()
+
+
+if __name__ == '__main__':
+    main()
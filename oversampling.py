@@ -0,0 +1,149 @@
+"""Vectorized SMOTE-style oversampling for class balancing.
+
+Like ``imblearn.over_sampling.SMOTE`` with ``sampling_strategy='auto'``:
+every class is topped up to the size of the largest one with points on the
+segment between a sample and one of its ``k`` nearest same-class neighbours.
+
+The neighbours of every sample are found once per class with one batched
+KD-tree (or ball-tree) query and kept in one flat table for all classes.
+Synthetic rows are produced in fixed-size batches that mix the classes,
+with a few vectorized gathers and no Python loop over samples.
+``iter_batches`` streams them, interleaved with the original rows, to
+``partial_fit`` trainers; ``resample`` fills one preallocated array for
+batch fitters.
+"""
+import math
+
+import numpy as np
+
+DEFAULT_BATCH_SIZE = 4096
+
+
+class Oversampler:
+    def __init__(self, k_neighbors=5, batch_size=DEFAULT_BATCH_SIZE, algorithm='kd_tree', random_state=None):
+        self.k_neighbors = k_neighbors
+        self.batch_size = batch_size
+        self.algorithm = algorithm
+        self.random_state = random_state
+
+    def fit(self, X, y):
+        """Index every class that needs rows and count how many it is missing."""
+        from sklearn.neighbors import BallTree, KDTree
+
+        tree_class = KDTree if self.algorithm == 'kd_tree' else BallTree
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y)
+        classes, counts = np.unique(y, return_counts=True)
+        target = counts.max()
+
+        labels, members, neighbours, sizes, ks, missing = [], [], [], [], [], []
+        offset = 0
+        for cls, count in zip(classes, counts):
+            if count == target:
+                continue
+            rows = X[y == cls]
+            k = min(self.k_neighbors, count - 1)
+            if k > 0:
+                # The nearest neighbour of every point is the point itself
+                _, idx = tree_class(rows).query(rows, k=k + 1)
+                idx = idx[:, 1:]
+            else:
+                # A single sample can only be repeated
+                k, idx = 1, np.zeros((count, 1), dtype=np.intp)
+            table = np.zeros((count, self.k_neighbors or 1), dtype=np.intp)
+            table[:, :k] = idx + offset
+            labels.append(cls)
+            members.append(rows)
+            neighbours.append(table)
+            sizes.append(count)
+            ks.append(k)
+            missing.append(target - count)
+            offset += count
+
+        self.labels_ = np.array(labels, dtype=y.dtype)
+        self.members_ = np.vstack(members) if members else np.empty((0, X.shape[1]))
+        self.neighbours_ = np.vstack(neighbours) if neighbours else np.empty((0, 1), dtype=np.intp)
+        self.sizes_ = np.array(sizes, dtype=np.intp)
+        self.offsets_ = np.cumsum(self.sizes_) - self.sizes_
+        self.ks_ = np.array(ks, dtype=np.intp)
+        self.missing_ = np.array(missing, dtype=np.intp)
+        return self
+
+    @property
+    def n_synthetic(self):
+        return int(self.missing_.sum())
+
+    def _generate(self, groups, rng, out):
+        """Write one synthetic row per entry of ``groups`` (class slots) into ``out``."""
+        n = len(groups)
+        base = self.offsets_[groups] + (rng.random(n) * self.sizes_[groups]).astype(np.intp)
+        partner = self.neighbours_[base, (rng.random(n) * self.ks_[groups]).astype(np.intp)]
+        x = self.members_[base]
+        # out = x + gap * (neighbour - x)
+        np.subtract(self.members_[partner], x, out=out)
+        out *= rng.random((n, 1))
+        out += x
+        return out
+
+    def _group_order(self, rng):
+        # Which class each synthetic row belongs to, in random order. One
+        # small int per row; the rows themselves only exist batch by batch.
+        return rng.permutation(np.repeat(np.arange(len(self.labels_)), self.missing_))
+
+    def iter_synthetic(self, rng=None):
+        """Yield (X_batch, y_batch) of synthetic rows only.
+
+        The same output buffer is reused for every batch, so consumers must
+        use or copy a batch before asking for the next one.
+        """
+        rng = rng or np.random.default_rng(self.random_state)
+        groups = self._group_order(rng)
+        buf = np.empty((min(self.batch_size, len(groups)), self.members_.shape[1]))
+        for start in range(0, len(groups), self.batch_size):
+            g = groups[start:start + self.batch_size]
+            yield self._generate(g, rng, buf[:len(g)]), self.labels_[g]
+
+    def iter_batches(self, X, y):
+        """Yield shuffled batches that mix original and synthetic rows.
+
+        Each batch holds the same share of synthetic rows, so an SGD-style
+        ``partial_fit`` trainer never sees a run of a single class.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y)
+        rng = np.random.default_rng(self.random_state)
+        order = rng.permutation(len(y))
+        groups = self._group_order(rng)
+        n_batches = max(1, math.ceil((len(y) + len(groups)) / self.batch_size))
+        orig_bounds = np.linspace(0, len(y), n_batches + 1).astype(np.intp)
+        syn_bounds = np.linspace(0, len(groups), n_batches + 1).astype(np.intp)
+        for i in range(n_batches):
+            idx = order[orig_bounds[i]:orig_bounds[i + 1]]
+            g = groups[syn_bounds[i]:syn_bounds[i + 1]]
+            Xb = np.empty((len(idx) + len(g), X.shape[1]))
+            yb = np.empty(len(idx) + len(g), dtype=y.dtype)
+            Xb[:len(idx)] = X[idx]
+            yb[:len(idx)] = y[idx]
+            self._generate(g, rng, Xb[len(idx):])
+            yb[len(idx):] = self.labels_[g]
+            mix = rng.permutation(len(yb))
+            yield Xb[mix], yb[mix]
+
+    def resample(self, X, y):
+        """Return the balanced (X, y) as arrays, filled batch by batch."""
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y)
+        n = len(y) + self.n_synthetic
+        X_out = np.empty((n, X.shape[1]))
+        y_out = np.empty(n, dtype=y.dtype)
+        X_out[:len(y)] = X
+        y_out[:len(y)] = y
+        pos = len(y)
+        for Xb, yb in self.iter_synthetic():
+            X_out[pos:pos + len(yb)] = Xb
+            y_out[pos:pos + len(yb)] = yb
+            pos += len(yb)
+        return X_out, y_out
+
+    def fit_resample(self, X, y):
+        return self.fit(X, y).resample(X, y)
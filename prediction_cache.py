@@ -0,0 +1,131 @@
+"""Process-wide memo of single-row predictions across Streamlit reruns.
+
+Entries are keyed on (artifact path, model version, quantized feature row).
+When a provider reports a new version for an artifact, that artifact's old
+entries are dropped, so a replaced model never serves stale results.
+
+Size, TTL and quantization can be set with the environment variables
+``TUMOR_CACHE_SIZE``, ``TUMOR_CACHE_TTL`` (seconds, 0 = no expiry) and
+``TUMOR_CACHE_DECIMALS``.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import get_metrics
+
+DEFAULT_MAXSIZE = 4096
+DEFAULT_TTL = 0.0
+DEFAULT_DECIMALS = 6
+
+
+class PredictionCache:
+    """Bounded LRU with optional TTL. Thread-safe; Streamlit sessions share it."""
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, ttl=DEFAULT_TTL, decimals=DEFAULT_DECIMALS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.decimals = decimals
+        self._data = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, path, version, row):
+        # Rounding makes values that differ only by float noise share an entry
+        return path, version, tuple(round(float(v), self.decimals) for v in row)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires is None or expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        path, version, _ = key
+        with self._lock:
+            if self._versions.get(path, version) != version:
+                self._drop_path(path)
+            self._versions[path] = version
+            expires = time.monotonic() + self.ttl if self.ttl else None
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def _drop_path(self, path):
+        for key in [k for k in self._data if k[0] == path]:
+            del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._versions.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'evictions': self.evictions,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_prediction_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PredictionCache(
+                maxsize=int(os.environ.get('TUMOR_CACHE_SIZE', DEFAULT_MAXSIZE)),
+                ttl=float(os.environ.get('TUMOR_CACHE_TTL', DEFAULT_TTL)),
+                decimals=int(os.environ.get('TUMOR_CACHE_DECIMALS', DEFAULT_DECIMALS)),
+            )
+        return _cache
+
+
+def cached_score(provider, row, cache=None, explain=False, snapshot=None):
+    """Score one feature row through ``provider``, memoized in ``cache``.
+
+    Returns ([class id], [confidence]) like ``scorer.score`` does for a
+    single row. With ``explain`` a third item holds the (n_features,
+    n_classes) logit contributions, or None when the model is not linear.
+    They come from the same pass as the prediction and are cached with it.
+
+    Pass ``snapshot`` (from ``provider.get()``) to score with the exact model
+    version that is also audited or displayed; a reload in between cannot
+    then swap it.
+    """
+    cache = cache or get_prediction_cache()
+    snapshot = snapshot or provider.get()
+    key = cache.key(snapshot.path, snapshot.version, row)
+    result = cache.get(key)
+    if result is None:
+        scorer = snapshot.scorer
+        contributions = None
+        with get_metrics().timer('model_score'):
+            if hasattr(scorer, 'explain'):
+                class_ids, confidence, contributions = scorer.explain([row])
+                contributions = contributions[0]
+            else:
+                class_ids, confidence = scorer.score([row])
+        result = ([class_ids[0].item()], [float(confidence[0])], contributions)
+        cache.put(key, result)
+    return result if explain else result[:2]
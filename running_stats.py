@@ -0,0 +1,77 @@
+"""Mergeable running statistics for chunked and streaming data."""
+import numpy as np
+
+
+class RunningMoments:
+    """Per-column count, mean and variance, updated one chunk at a time.
+
+    Chunks are merged with the parallel form of Welford's algorithm (Chan et
+    al.), which stays numerically stable without keeping any rows.
+    """
+
+    def __init__(self, n_columns):
+        self.n = 0
+        self.mean = np.zeros(n_columns)
+        self.m2 = np.zeros(n_columns)
+
+    def update(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        nb = X.shape[0]
+        if nb == 0:
+            return self
+        mean_b = X.mean(axis=0)
+        m2_b = ((X - mean_b) ** 2).sum(axis=0)
+        n = self.n + nb
+        delta = mean_b - self.mean
+        self.mean = self.mean + delta * (nb / n)
+        self.m2 = self.m2 + m2_b + delta ** 2 * (self.n * nb / n)
+        self.n = n
+        return self
+
+    def merge(self, other):
+        if other.n:
+            n = self.n + other.n
+            delta = other.mean - self.mean
+            self.mean = self.mean + delta * (other.n / n)
+            self.m2 = self.m2 + other.m2 + delta ** 2 * (self.n * other.n / n)
+            self.n = n
+        return self
+
+    @property
+    def var(self):
+        # Population variance (ddof=0), as used by scipy.stats.zscore and StandardScaler
+        return self.m2 / self.n if self.n else np.zeros_like(self.m2)
+
+    @property
+    def std(self):
+        return np.sqrt(self.var)
+
+    def scale(self):
+        """Standard deviation with zeros replaced by 1, like StandardScaler.scale_."""
+        std = self.std
+        return np.where(std == 0, 1.0, std)
+
+
+def histogram_quantiles(counts, edges, lo, hi, qs=(0.25, 0.5, 0.75)):
+    """Quantiles ``qs`` of one histogram, interpolated linearly inside its slots.
+
+    ``counts`` has ``len(edges) + 1`` slots: underflow, one per bin, overflow.
+    The outer slots end at the observed minimum ``lo`` and maximum ``hi``.
+    All NaN for an empty histogram.
+    """
+    out = np.full(len(qs), np.nan)
+    total = counts.sum()
+    if not total:
+        return out
+    lower = np.concatenate([[min(lo, edges[0])], edges])
+    upper = np.concatenate([edges, [max(hi, edges[-1])]])
+    cumulative = np.cumsum(counts)
+    for j, q in enumerate(qs):
+        rank = q * total
+        slot = min(int(np.searchsorted(cumulative, rank)), len(counts) - 1)
+        before = cumulative[slot] - counts[slot]
+        frac = (rank - before) / counts[slot] if counts[slot] else 0.0
+        out[j] = lower[slot] + frac * (upper[slot] - lower[slot])
+    return out
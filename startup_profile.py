@@ -0,0 +1,90 @@
+"""Import-time profile and cold-start budget for the Streamlit apps.
+
+Runs each app script in a fresh interpreter with ``python -X importtime``.
+Prints the slowest imports, grouped by top-level package, and fails when:
+
+* the total import time exceeds ``--budget-ms``, or
+* a module that should load on first use (plotly, sklearn, ...) is already
+  imported before the first paint.
+
+Background model preloading is disabled during the run, because it imports
+sklearn on purpose once the form has been sent.
+
+Usage:
+    python startup_profile.py                  # all apps, default budget
+    python startup_profile.py app.py --top 30 --budget-ms 800
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from model_provider import BASE_DIR
+
+APPS = ['app.py', 'app(1).py', 'app(2).py']
+COLD_START_BUDGET_MS = 1500.0
+# Heavy modules the apps only need after "🔍 Predict" or a batch upload
+DEFERRED_MODULES = ['plotly', 'sklearn', 'joblib', 'scipy']
+
+
+def profile_imports(app):
+    """Return {module: (self_us, cumulative_us)} for one run of ``app``."""
+    code = f"import runpy; runpy.run_path({app!r}, run_name='__main__')"
+    env = dict(os.environ, TUMOR_APP_NO_PRELOAD='1', TUMOR_AUDIT='0')
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    if proc.returncode != 0:
+        raise RuntimeError(f"{app} failed:\n{proc.stderr[-2000:]}")
+    return modules
+
+
+def by_package(modules):
+    # Self times add up without double counting nested imports
+    totals = defaultdict(int)
+    for name, (self_us, _) in modules.items():
+        totals[name.split('.')[0]] += self_us
+    return sorted(totals.items(), key=lambda kv: kv[1], reverse=True)
+
+
+def check_app(app, budget_ms, top, deferred):
+    modules = profile_imports(app)
+    total_ms = sum(s for s, _ in modules.values()) / 1000
+    print(f"\n{app}: {total_ms:.1f} ms in {len(modules)} imports (budget {budget_ms:.0f} ms)")
+    for package, self_us in by_package(modules)[:top]:
+        print(f"  {package:<30}{self_us / 1000:>10.1f} ms")
+
+    problems = []
+    if total_ms > budget_ms:
+        problems.append(f"import time {total_ms:.1f} ms exceeds the {budget_ms:.0f} ms budget")
+    eager = sorted({name.split('.')[0] for name in modules} & set(deferred))
+    if eager:
+        problems.append(f"imported before first paint: {', '.join(eager)}")
+    for problem in problems:
+        print(f"  FAIL: {problem}")
+    return not problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('apps', nargs='*', default=APPS)
+    parser.add_argument('--budget-ms', type=float, default=COLD_START_BUDGET_MS)
+    parser.add_argument('--top', type=int, default=15, help="packages to list per app")
+    parser.add_argument('--allow', nargs='*', default=[], help="deferred modules to allow at startup")
+    args = parser.parse_args(argv)
+
+    deferred = [m for m in DEFERRED_MODULES if m not in args.allow]
+    ok = all([check_app(app, args.budget_ms, args.top, deferred) for app in args.apps])
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""Constant-memory version of the notebook's preprocessing.
+
+Produces the equivalents of ``cleaned_data.csv`` (rows with all |z| < 3 on
+the raw columns, as ``remove_outliers_zscore``) and ``preprocessed_data.csv``
+(LabelEncoder classes, I0_log, StandardScaler over all rows) in two passes
+over the input. Only one chunk is held in memory at a time:
+
+1. accumulate running mean/variance of the raw and model columns and the
+   class vocabulary;
+2. filter |z| > 3 and standardize each chunk, appending to the outputs.
+
+``--verify`` reruns the in-memory version and checks that both agree: the
+same rows and class codes exactly, and standardized values equal to
+floating-point rounding.
+
+Usage:
+    python streaming_preprocess.py data.csv --chunksize 100000 --verify
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from features import FEATURE_COLUMNS, RAW_COLUMNS, add_log_feature
+from model_provider import BASE_DIR
+from running_stats import RunningMoments
+
+DEFAULT_CHUNKSIZE = 100_000
+Z_THRESHOLD = 3
+
+
+def _chunks(path, chunksize):
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        chunk.columns = chunk.columns.str.strip()
+        yield chunk
+
+
+def fit_statistics(path, chunksize=DEFAULT_CHUNKSIZE):
+    """Pass 1: moments of the raw and model columns, plus the class vocabulary."""
+    raw_moments = RunningMoments(len(RAW_COLUMNS))
+    feature_moments = RunningMoments(len(FEATURE_COLUMNS))
+    classes = set()
+    for chunk in _chunks(path, chunksize):
+        raw = chunk[RAW_COLUMNS].to_numpy(dtype=np.float64)
+        raw_moments.update(raw)
+        feature_moments.update(add_log_feature(raw))
+        classes.update(chunk['Class'].unique())
+    return {
+        'raw_mean': raw_moments.mean,
+        'raw_std': raw_moments.std,
+        'feature_mean': feature_moments.mean,
+        'feature_scale': feature_moments.scale(),
+        # LabelEncoder assigns codes in sorted order
+        'classes': np.array(sorted(classes)),
+        'n_rows': raw_moments.n,
+    }
+
+
+def transform(path, stats, cleaned_path, preprocessed_path, chunksize=DEFAULT_CHUNKSIZE):
+    """Pass 2: write the outlier-filtered and the standardized datasets."""
+    kept = 0
+    for i, chunk in enumerate(_chunks(path, chunksize)):
+        mode, header = ('w', True) if i == 0 else ('a', False)
+        # A chunk of whole numbers would otherwise be written as integers
+        chunk = chunk.astype({c: np.float64 for c in RAW_COLUMNS})
+        raw = chunk[RAW_COLUMNS].to_numpy()
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z = np.abs((raw - stats['raw_mean']) / stats['raw_std'])
+        mask = (z < Z_THRESHOLD).all(axis=1)
+        chunk[mask].to_csv(cleaned_path, mode=mode, header=header, index=False)
+        kept += int(mask.sum())
+
+        X = add_log_feature(raw)
+        X -= stats['feature_mean']
+        X /= stats['feature_scale']
+        out = pd.DataFrame(X, columns=FEATURE_COLUMNS)
+        out['Class'] = np.searchsorted(stats['classes'], chunk['Class'].to_numpy())
+        out.to_csv(preprocessed_path, mode=mode, header=header, index=False)
+    return kept
+
+
+def preprocess_in_memory(path):
+    """The notebook's version, on the whole DataFrame (for --verify)."""
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+    df = pd.read_csv(path)
+    df.columns = df.columns.str.strip()
+    df = df.astype({c: np.float64 for c in RAW_COLUMNS})
+    raw = df[RAW_COLUMNS].to_numpy(dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = np.abs((raw - raw.mean(axis=0)) / raw.std(axis=0))
+    cleaned = df[(z < Z_THRESHOLD).all(axis=1)]
+
+    X = StandardScaler().fit_transform(add_log_feature(raw))
+    preprocessed = pd.DataFrame(X, columns=FEATURE_COLUMNS)
+    preprocessed['Class'] = LabelEncoder().fit_transform(df['Class'])
+    return cleaned, preprocessed
+
+
+def verify(path, cleaned_path, preprocessed_path, rtol=1e-9, atol=1e-12):
+    cleaned, preprocessed = preprocess_in_memory(path)
+    # round_trip parsing reads back exactly the floats that were written
+    streamed_cleaned = pd.read_csv(cleaned_path, float_precision='round_trip')
+    streamed_pre = pd.read_csv(preprocessed_path, float_precision='round_trip')
+    problems = []
+    if not cleaned.reset_index(drop=True).equals(streamed_cleaned):
+        problems.append("cleaned rows differ")
+    if not np.array_equal(preprocessed['Class'].to_numpy(), streamed_pre['Class'].to_numpy()):
+        problems.append("class codes differ")
+    if not np.allclose(preprocessed[FEATURE_COLUMNS].to_numpy(), streamed_pre[FEATURE_COLUMNS].to_numpy(),
+                       rtol=rtol, atol=atol):
+        problems.append("standardized features differ")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('input', nargs='?', default=os.path.join(BASE_DIR, 'data.csv'))
+    parser.add_argument('--cleaned', default=os.path.join(BASE_DIR, 'cleaned_data.csv'))
+    parser.add_argument('--preprocessed', default=os.path.join(BASE_DIR, 'preprocessed_data.csv'))
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--verify', action='store_true', help="compare with the in-memory version")
+    args = parser.parse_args(argv)
+
+    stats = fit_statistics(args.input, args.chunksize)
+    kept = transform(args.input, stats, args.cleaned, args.preprocessed, args.chunksize)
+    print(f"{stats['n_rows']} rows, {kept} kept after outlier removal, classes: {', '.join(map(str, stats['classes']))}")
+    if args.verify:
+        problems = verify(args.input, args.cleaned, args.preprocessed)
+        if problems:
+            raise SystemExit("Mismatch with the in-memory version: " + "; ".join(problems))
+        print("Matches the in-memory version (same rows and labels, features equal to rounding).")
+
+
+if __name__ == '__main__':
+    main()
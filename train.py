@@ -0,0 +1,228 @@
+"""Scriptable, parallel version of the model selection in mlops.ipynb.
+
+The notebook fits every candidate once to build ``results`` and then again
+from scratch to pick ``best_model``. Here each (candidate, fold) pair of a
+stratified k-fold CV is fitted exactly once, in a process pool, and the
+fitted folds are cached on disk. The cache key is the hash of the training
+data and the hyperparameters, so re-running with unchanged data only fits
+what is new. Only the winner is refitted on the full data and published to the
+model registry (model_registry.py).
+
+Usage:
+    python train.py --folds 5 --jobs 4
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.model_selection import StratifiedKFold
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.svm import SVC
+
+from dataset_cache import open_dataset
+from features import RAW_COLUMNS, add_log_feature
+from model_provider import BASE_DIR
+
+DATA_PATH = os.path.join(BASE_DIR, 'data.csv')
+CACHE_DIR = os.path.join(BASE_DIR, '.cache', 'folds')
+REPORT_PATH = os.path.join(BASE_DIR, 'training_report.json')
+
+
+def candidate_models():
+    # Same candidates as the notebook. SVC needs probability=True because
+    # the apps rely on predict_proba for the confidence.
+    return {
+        'Random Forest': RandomForestClassifier(random_state=42),
+        'Logistic Regression': LogisticRegression(max_iter=1000, random_state=42),
+        'SVM': SVC(probability=True, random_state=42),
+    }
+
+
+class TrainingData:
+    """data.csv after the notebook's preprocessing (labels, I0_log, scaling).
+
+    Reads through the memory-mapped dataset cache (dataset_cache.py), so
+    worker processes share the page-cached columns instead of each parsing
+    the CSV. Class codes follow LabelEncoder's sorted order.
+    """
+
+    def __init__(self, path=DATA_PATH):
+        dataset = open_dataset(path, dtype=np.float64)
+        self.classes = np.array(dataset.classes)
+        self.y = np.asarray(dataset.labels)
+        self.raw = dataset.matrix(RAW_COLUMNS)
+        self.preprocess_scaler = StandardScaler()
+        self.X = self.preprocess_scaler.fit_transform(add_log_feature(self.raw))
+        self.data_hash = dataset.sha256
+
+
+def fold_key(data_hash, name, estimator, n_folds, seed, fold, balance=False):
+    params = json.dumps(estimator.get_params(deep=True), sort_keys=True, default=repr)
+    text = f"{data_hash}|{name}|{params}|{n_folds}|{seed}|{fold}|{balance}"
+    return hashlib.sha256(text.encode()).hexdigest()[:24]
+
+
+# Each worker process loads the data once instead of receiving it per task
+_data = None
+
+
+def _init_worker(path):
+    global _data
+    _data = TrainingData(path)
+
+
+def balance_classes(X, y, seed=42):
+    """Oversample every class to the size of the largest one (oversampling.py)."""
+    from oversampling import Oversampler
+
+    return Oversampler(random_state=seed).fit_resample(X, y)
+
+
+def _fit_fold(name, estimator, train_idx, val_idx, cache_path, balance=False):
+    if cache_path and os.path.exists(cache_path):
+        entry = joblib.load(cache_path)
+        entry['cached'] = True
+        return name, entry
+
+    # Scale inside the fold, like the notebook's train split scaler
+    pipeline = make_pipeline(StandardScaler(), clone(estimator))
+    start = time.perf_counter()
+    X_train, y_train = _data.X[train_idx], _data.y[train_idx]
+    if balance:
+        # Only the training part of the fold: synthetic rows never leak into validation
+        X_train, y_train = balance_classes(X_train, y_train)
+    pipeline.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - start
+    predictions = pipeline.predict(_data.X[val_idx])
+    entry = {
+        'model': pipeline,
+        'accuracy': float(accuracy_score(_data.y[val_idx], predictions)),
+        'f1_macro': float(f1_score(_data.y[val_idx], predictions, average='macro')),
+        'fit_seconds': fit_seconds,
+        'cached': False,
+    }
+    if cache_path:
+        joblib.dump(entry, cache_path)
+    return name, entry
+
+
+def cross_validate(data, models, n_folds=5, seed=42, jobs=None, use_cache=True, data_path=DATA_PATH,
+                   balance=False):
+    """Fit every (candidate, fold) once across a process pool."""
+    if use_cache:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+    folds = list(StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=seed).split(data.X, data.y))
+    scores = {name: [] for name in models}
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(data_path,)) as pool:
+        futures = []
+        for name, estimator in models.items():
+            for i, (train_idx, val_idx) in enumerate(folds):
+                cache_path = None
+                if use_cache:
+                    key = fold_key(data.data_hash, name, estimator, n_folds, seed, i, balance)
+                    cache_path = os.path.join(CACHE_DIR, f"{key}.joblib")
+                futures.append(pool.submit(_fit_fold, name, estimator, train_idx, val_idx, cache_path, balance))
+        for future in futures:
+            name, entry = future.result()
+            entry.pop('model')
+            scores[name].append(entry)
+    return scores
+
+
+def summarize(scores):
+    summary = {}
+    for name, folds in scores.items():
+        accuracy = [f['accuracy'] for f in folds]
+        f1 = [f['f1_macro'] for f in folds]
+        summary[name] = {
+            'accuracy_mean': float(np.mean(accuracy)),
+            'accuracy_std': float(np.std(accuracy)),
+            'f1_macro_mean': float(np.mean(f1)),
+            'fit_seconds': float(sum(f['fit_seconds'] for f in folds)),
+            'cached_folds': sum(f['cached'] for f in folds),
+            'folds': folds,
+        }
+    return summary
+
+
+def pick_winner(summary):
+    return max(summary, key=lambda name: (summary[name]['accuracy_mean'], summary[name]['f1_macro_mean']))
+
+
+def fit_final(data, estimator, balance=False):
+    """Refit the winner on all rows, with a train scaler as in the notebook."""
+    X, y = balance_classes(data.X, data.y) if balance else (data.X, data.y)
+    train_scaler = StandardScaler()
+    X = train_scaler.fit_transform(X)
+    model = clone(estimator).fit(X, y)
+    return model, train_scaler
+
+
+def export_winner(data, model, train_scaler, metrics=None):
+    """Publish the winner as a new, active version of the model registry."""
+    from feature_pipeline import publish_model
+
+    return publish_model(model, [data.preprocess_scaler, train_scaler], data.classes, data.raw,
+                         data_hash=data.data_hash, metrics=metrics)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data', default=DATA_PATH)
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--jobs', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--no-cache', action='store_true', help="ignore and do not write the fold cache")
+    parser.add_argument('--report', default=REPORT_PATH)
+    parser.add_argument('--balance', action='store_true', help="oversample minority classes (SMOTE-style)")
+    parser.add_argument('--dry-run', action='store_true', help="evaluate only, do not publish the winner")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    data = TrainingData(args.data)
+    models = candidate_models()
+    scores = cross_validate(data, models, args.folds, args.seed, args.jobs, not args.no_cache, args.data,
+                            args.balance)
+    summary = summarize(scores)
+    winner = pick_winner(summary)
+
+    for name, s in summary.items():
+        print(f"{name:<22} accuracy {s['accuracy_mean']:.3f} ± {s['accuracy_std']:.3f}  "
+              f"macro-F1 {s['f1_macro_mean']:.3f}  ({s['cached_folds']}/{args.folds} folds cached)")
+    print(f"The best model is: {winner}")
+
+    if not args.dry_run:
+        model, train_scaler = fit_final(data, models[winner], args.balance)
+        s = summary[winner]
+        metrics = {'cv_accuracy': s['accuracy_mean'], 'cv_accuracy_std': s['accuracy_std'],
+                   'cv_f1_macro': s['f1_macro_mean'], 'cv_folds': args.folds}
+        version = export_winner(data, model, train_scaler, metrics)
+        print(f"Published {winner} as model version {version}")
+
+    report = {
+        'data': os.path.basename(args.data),
+        'data_hash': data.data_hash,
+        'folds': args.folds,
+        'seed': args.seed,
+        'balance': args.balance,
+        'winner': winner,
+        'candidates': summary,
+        'wall_seconds': time.perf_counter() - start,
+    }
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.report}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+"""Regularization path search for the LogisticRegression model.
+
+Sweeps ``C`` on a log grid for each class weighting. Along the path each fit
+starts from the previous coefficients (``warm_start=True``), which is far
+cheaper than a cold lbfgs start because neighbouring ``C`` values have close
+optima. Candidates are pruned with successive halving across CV folds:
+every (C, class_weight) pair is scored on the first fold(s), only the best
+1/eta go on to the next rung with more folds, and so on until one rung uses
+all folds.
+
+``--compare-cold`` also refits every evaluated (candidate, fold) pair from
+scratch and reports the time saved by warm starts and by the pruning, against
+cold fits of the full grid on every fold.
+
+Usage:
+    python tune.py --folds 5 --eta 3 --compare-cold
+    python tune.py --publish
+"""
+import argparse
+import json
+import math
+import os
+import time
+
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import StratifiedKFold
+from sklearn.preprocessing import StandardScaler
+
+from model_provider import BASE_DIR
+from train import DATA_PATH, TrainingData
+
+REPORT_PATH = os.path.join(BASE_DIR, 'tuning_report.json')
+CLASS_WEIGHTS = [None, 'balanced']
+
+
+def c_grid(c_min=1e-3, c_max=1e3, n=13):
+    # Strong to weak regularization: the path is walked in this order
+    return list(np.logspace(math.log10(c_min), math.log10(c_max), n))
+
+
+def _make_estimator(C, class_weight, warm_start):
+    # Same solver settings as the model in mlops.ipynb
+    return LogisticRegression(C=C, class_weight=class_weight, max_iter=1000,
+                              random_state=42, warm_start=warm_start)
+
+
+class FoldData:
+    """One CV fold, scaled once with a train-split scaler (as in the notebook)."""
+
+    def __init__(self, data, train_idx, val_idx):
+        scaler = StandardScaler().fit(data.X[train_idx])
+        self.X_train = scaler.transform(data.X[train_idx])
+        self.y_train = data.y[train_idx]
+        self.X_val = scaler.transform(data.X[val_idx])
+        self.y_val = data.y[val_idx]
+
+
+def _fit(estimator, fold):
+    start = time.perf_counter()
+    estimator.fit(fold.X_train, fold.y_train)
+    seconds = time.perf_counter() - start
+    accuracy = float((estimator.predict(fold.X_val) == fold.y_val).mean())
+    return accuracy, seconds, int(np.max(estimator.n_iter_))
+
+
+def walk_path(fold, candidates, class_weight):
+    """Fit ``candidates`` (C values, ascending) on one fold, warm-starting each from the last."""
+    estimator = _make_estimator(candidates[0], class_weight, warm_start=True)
+    results = {}
+    for C in candidates:
+        estimator.set_params(C=C)
+        results[C] = _fit(estimator, fold)
+    return results
+
+
+def successive_halving(folds, grid, class_weights=CLASS_WEIGHTS, eta=3, min_folds=1):
+    """Return (ranking, evaluations) of the (C, class_weight) candidates.
+
+    ``evaluations`` lists every (C, class_weight, fold) that was fitted, with
+    its accuracy, fit time and lbfgs iterations.
+    """
+    survivors = [(C, cw) for cw in class_weights for C in grid]
+    scores = {c: [] for c in survivors}
+    evaluations = []
+
+    # One rung per factor of eta; the fold budget grows by eta per rung and
+    # the last rung uses every fold
+    n_rungs, n = 1, len(survivors)
+    while n > eta:
+        n //= eta
+        n_rungs += 1
+    budgets = [min(len(folds), max(min_folds, math.ceil(len(folds) / eta ** (n_rungs - 1 - r))))
+               for r in range(n_rungs)]
+
+    n_used = 0
+    for rung, budget in enumerate(budgets):
+        for f in range(n_used, budget):
+            for cw in class_weights:
+                path = sorted(C for C, w in survivors if w == cw)
+                if not path:
+                    continue
+                for C, (accuracy, seconds, n_iter) in walk_path(folds[f], path, cw).items():
+                    scores[(C, cw)].append(accuracy)
+                    evaluations.append({'C': C, 'class_weight': cw, 'fold': f, 'accuracy': accuracy,
+                                        'fit_seconds': seconds, 'n_iter': n_iter})
+        n_used = max(n_used, budget)
+        survivors = sorted(survivors, key=lambda c: np.mean(scores[c]), reverse=True)
+        if rung < len(budgets) - 1:
+            survivors = survivors[:max(1, len(survivors) // eta)]
+
+    ranking = [{'C': C, 'class_weight': cw, 'accuracy_mean': float(np.mean(scores[(C, cw)])),
+                'folds': len(scores[(C, cw)])}
+               for C, cw in sorted(scores, key=lambda c: (len(scores[c]), np.mean(scores[c])), reverse=True)]
+    return ranking, evaluations
+
+
+def cold_fit_times(folds, evaluations):
+    """Refit each evaluated (candidate, fold) from scratch; returns {(C, cw, fold): (seconds, n_iter)}."""
+    times = {}
+    for e in evaluations:
+        estimator = _make_estimator(e['C'], e['class_weight'], warm_start=False)
+        _, seconds, n_iter = _fit(estimator, folds[e['fold']])
+        times[(e['C'], e['class_weight'], e['fold'])] = (seconds, n_iter)
+    return times
+
+
+def savings_report(evaluations, cold, n_candidates, n_folds):
+    warm_seconds = sum(e['fit_seconds'] for e in evaluations)
+    warm_iter = sum(e['n_iter'] for e in evaluations)
+    cold_seconds = sum(s for s, _ in cold.values())
+    cold_iter = sum(n for _, n in cold.values())
+    # The full grid on every fold, cold, at the measured mean cost per fit
+    full_grid_seconds = cold_seconds / len(cold) * n_candidates * n_folds
+    return {
+        'fits': len(evaluations),
+        'full_grid_fits': n_candidates * n_folds,
+        'warm_seconds': warm_seconds,
+        'warm_iterations': warm_iter,
+        'cold_seconds': cold_seconds,
+        'cold_iterations': cold_iter,
+        'full_grid_cold_seconds': full_grid_seconds,
+        'saved_by_warm_start': 1 - warm_seconds / cold_seconds if cold_seconds else 0.0,
+        'saved_total': 1 - warm_seconds / full_grid_seconds if full_grid_seconds else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data', default=DATA_PATH)
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--eta', type=int, default=3, help="keep the best 1/eta candidates per rung")
+    parser.add_argument('--c-min', type=float, default=1e-3)
+    parser.add_argument('--c-max', type=float, default=1e3)
+    parser.add_argument('--n-c', type=int, default=13, help="number of C values on the path")
+    parser.add_argument('--compare-cold', action='store_true', help="also time independent cold fits")
+    parser.add_argument('--publish', action='store_true', help="refit the best candidate and publish it")
+    parser.add_argument('--report', default=REPORT_PATH)
+    args = parser.parse_args(argv)
+
+    data = TrainingData(args.data)
+    splits = StratifiedKFold(n_splits=args.folds, shuffle=True, random_state=args.seed).split(data.X, data.y)
+    folds = [FoldData(data, train_idx, val_idx) for train_idx, val_idx in splits]
+    grid = c_grid(args.c_min, args.c_max, args.n_c)
+
+    ranking, evaluations = successive_halving(folds, grid, eta=args.eta)
+    best = ranking[0]
+    warm_seconds = sum(e['fit_seconds'] for e in evaluations)
+    print(f"{len(evaluations)} warm-started fits in {warm_seconds:.2f} s "
+          f"(full grid: {len(grid) * len(CLASS_WEIGHTS) * args.folds} fits)")
+    for r in ranking[:5]:
+        print(f"C={r['C']:<10.4g} class_weight={str(r['class_weight']):<9} "
+              f"accuracy {r['accuracy_mean']:.3f} over {r['folds']} folds")
+
+    report = {
+        'data_hash': data.data_hash,
+        'folds': args.folds,
+        'eta': args.eta,
+        'grid': grid,
+        'best': best,
+        'ranking': ranking,
+        'evaluations': evaluations,
+    }
+    if args.compare_cold:
+        cold = cold_fit_times(folds, evaluations)
+        savings = savings_report(evaluations, cold, len(grid) * len(CLASS_WEIGHTS), args.folds)
+        report['savings'] = savings
+        print(f"Cold fits of the same pairs: {savings['cold_seconds']:.2f} s "
+              f"({savings['saved_by_warm_start']:.0%} saved by warm starts, "
+              f"{savings['warm_iterations']} vs {savings['cold_iterations']} lbfgs iterations)")
+        print(f"Full grid, cold: ~{savings['full_grid_cold_seconds']:.2f} s "
+              f"({savings['saved_total']:.0%} saved in total)")
+
+    if args.publish:
+        from train import export_winner, fit_final
+
+        estimator = _make_estimator(best['C'], best['class_weight'], warm_start=False)
+        model, train_scaler = fit_final(data, estimator)
+        version = export_winner(data, model, train_scaler, {
+            'cv_accuracy': best['accuracy_mean'], 'cv_folds': best['folds'],
+            'C': best['C'], 'class_weight': best['class_weight'],
+        })
+        print(f"Published C={best['C']:.4g}, class_weight={best['class_weight']} as model version {version}")
+
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.report}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+"""Streamlit sections shared by app.py, app(1).py and app(2).py.
+
+Only streamlit and the standard library are imported at module level. The
+numeric stack (numpy, pandas, sklearn) is imported when a section is
+actually used, so a fresh session draws the input form without paying for
+them.
+"""
+import streamlit as st
+
+from model_registry import get_registry_provider
+
+# Uploads are held in memory by Streamlit, and so is the download
+MAX_UPLOAD_MB = 50
+
+
+def render_batch_section(model_provider):
+    """Upload/download UI for bulk scoring (see batch_scoring.py).
+
+    Uploads are raw data.csv rows, so the folded model is used when present.
+    The upload and the predictions both pass through this process's memory,
+    so uploads are capped at ``MAX_UPLOAD_MB``; the constant-memory path for
+    large files is the ``batch_scoring.py`` command line.
+    """
+    with st.expander("📂 Batch scoring (CSV upload)"):
+        st.write(
+            "Upload measurements in the same layout as data.csv "
+            "(Class optional, I0, PA500, HFS, DA, Area, A.DA, Max.IP, DR, P). I0_log is derived automatically. "
+            f"Files up to {MAX_UPLOAD_MB} MB; use `batch_scoring.py` for larger ones."
+        )
+        uploaded = st.file_uploader("Measurements CSV", type="csv")
+        explain = st.checkbox("Include top contributing features per row")
+        if uploaded is not None and uploaded.size > MAX_UPLOAD_MB * 2**20:
+            st.error(f"🚨 The file is larger than {MAX_UPLOAD_MB} MB. Score it with "
+                     "`python batch_scoring.py measurements.csv -o predictions.csv` instead.")
+        elif uploaded is not None and st.button("📊 Score file"):
+            try:
+                import tempfile
+
+                from audit_log import chunk_recorder, get_audit_log, model_version
+                from batch_scoring import raw_scorer, score_csv
+                from cohort import CohortAggregator
+                from drift import get_drift_monitor
+                from features import class_names
+
+                folded_provider = get_registry_provider('folded')
+                if folded_provider.exists():
+                    model_provider = folded_provider
+                snapshot = model_provider.get()
+                scorer = raw_scorer(snapshot.scorer)
+                aggregator = CohortAggregator(class_names=class_names(getattr(scorer, 'label_classes', None)))
+                monitor = get_drift_monitor('raw')
+                audit = get_audit_log()
+                record = chunk_recorder(audit, model_version(snapshot), source='app_batch') if audit else None
+
+                def on_chunk(chunk, result):
+                    aggregator.on_chunk(chunk, result)
+                    monitor.on_chunk(chunk, result)
+                    if record is not None:
+                        record(chunk, result)
+
+                # Scoring itself goes chunk by chunk into a temporary file;
+                # the download button then reads that file in full
+                with tempfile.TemporaryFile(mode='w+', newline='') as out:
+                    report = score_csv(uploaded, out, scorer=scorer, on_chunk=on_chunk, explain=explain)
+                    out.seek(0)
+                    st.success(f"✅ {report}")
+                    st.download_button("⬇️ Download predictions", out, file_name="predictions.csv", mime="text/csv")
+                # Only the aggregates are kept for the cohort view
+                st.session_state['cohort'] = aggregator.summary()
+            except Exception as e:
+                st.error(f"🚨 An error occurred: {str(e)}")
+        if 'cohort' in st.session_state:
+            render_cohort(st.session_state['cohort'])
+
+
+def render_explanation(contributions, class_id, class_names, k=3):
+    """The features that pushed the prediction, from ``cached_score(..., explain=True)``.
+
+    Nothing is shown for models without exact contributions (e.g. forests).
+    """
+    if contributions is None:
+        return
+    from features import FEATURE_COLUMNS
+    from inference import top_features
+
+    def top(c):
+        idx, values = top_features(contributions[None], [c], k)
+        return ", ".join(f"{FEATURE_COLUMNS[j]} ({v:+.2f})" for j, v in zip(idx[0], values[0]))
+
+    st.write(f"🧭 *Main factors for {class_names[class_id]}*: {top(class_id)}")
+    with st.expander("Why this class? Feature contributions per class"):
+        st.markdown("| class | strongest features |\n|---|---|\n" +
+                    "\n".join(f"| {name} | {top(c)} |" for c, name in class_names.items()))
+        st.caption("Each value is the feature's exact share of the class score (weight × scaled value).")
+
+
+def audit_prediction(snapshot, row, class_id, confidence, raw_input):
+    """Add the prediction to the audit log (audit_log.py); only buffered, not written here.
+
+    ``snapshot`` is the one the prediction was scored with (``cached_score(..., snapshot=)``).
+    """
+    from audit_log import get_audit_log, model_version
+
+    audit = get_audit_log()
+    if audit is not None:
+        audit.record(row, class_id, confidence, model_version(snapshot),
+                     source='app', space='raw' if raw_input else 'scaled')
+
+
+def check_drift(row, raw_input):
+    """Feed the scored row to the drift monitor (drift.py) and warn if it is out of range."""
+    from drift import get_drift_monitor
+    from features import FEATURE_COLUMNS
+    from metrics import get_metrics
+
+    with get_metrics().timer('drift'):
+        outside = get_drift_monitor('raw' if raw_input else 'scaled').observe([row])[0]
+    features = [name for name, out in zip(FEATURE_COLUMNS, outside) if out]
+    if features:
+        st.warning(f"⚠️ Outside the range seen in training: {', '.join(features)}. "
+                   "The model has not seen such values; treat this prediction with caution.")
+
+
+def render_cohort(summary):
+    """Class counts, per-class radar envelopes and histograms of a scored batch.
+
+    Drawn from ``cohort.CohortAggregator.summary()``, so the figures are the
+    same size however many rows were scored.
+    """
+    import plotly.graph_objects as go
+
+    st.markdown(f"#### 🧬 Cohort overview ({summary['rows']} rows)")
+    classes, columns = summary['classes'], summary['columns']
+    present = [i for i, n in enumerate(summary['counts']) if n]
+
+    st.plotly_chart(go.Figure(go.Bar(x=classes, y=summary['counts'])).update_layout(
+        title="Predicted classes", height=300, margin=dict(t=40, b=20)))
+
+    radar = go.Figure()
+    for i in present:
+        q1, q3 = summary['radar_q1'][i], summary['radar_q3'][i]
+        # IQR band: q3 around the circle, then q1 back
+        radar.add_trace(go.Scatterpolar(r=q3 + q1[::-1], theta=columns + columns[::-1], fill='toself',
+                                        opacity=0.25, line=dict(width=0), name=f"{classes[i]} IQR",
+                                        legendgroup=classes[i], hoverinfo='skip'))
+        radar.add_trace(go.Scatterpolar(r=summary['radar_median'][i], theta=columns, name=f"{classes[i]} median",
+                                        legendgroup=classes[i], customdata=summary['median'][i],
+                                        hovertemplate="%{theta}: %{customdata:.4g}<extra></extra>"))
+    radar.update_layout(title="Median and IQR per class (share of the training range)",
+                        polar=dict(radialaxis=dict(range=[0, 1])))
+    st.plotly_chart(radar)
+
+    feature = st.selectbox("Histogram of", columns, key='cohort_feature')
+    f = columns.index(feature)
+    edges = summary['edges'][f]
+    centers = [(a + b) / 2 for a, b in zip(edges[:-1], edges[1:])]
+    hist = go.Figure()
+    for i in present:
+        # Regular bins only; values outside the training range are counted below
+        hist.add_trace(go.Bar(x=centers, y=summary['hist'][i][f][1:-1], name=classes[i]))
+    outside = sum(summary['hist'][i][f][0] + summary['hist'][i][f][-1] for i in present)
+    hist.update_layout(barmode='stack', bargap=0, title=f"{feature} by predicted class", height=350)
+    st.plotly_chart(hist)
+    if outside:
+        st.caption(f"{outside} values of {feature} fall outside the training range.")
+
+
+def render_cache_stats():
+    """Sidebar counters for the process-wide prediction cache."""
+    from prediction_cache import get_prediction_cache
+
+    stats = get_prediction_cache().stats()
+    st.sidebar.caption(
+        f"Prediction cache: {stats['hit_rate']:.0%} hit rate "
+        f"({stats['hits']} hits, {stats['misses']} misses) · "
+        f"{stats['size']}/{stats['maxsize']} entries"
+    )
+
+
+def render_drift_panel():
+    """Sidebar panel with the input drift status of this process (see drift.py)."""
+    from drift import active_monitors
+
+    monitors = active_monitors()
+    if not monitors:
+        return
+    with st.sidebar.expander("📈 Input drift"):
+        for space, monitor in monitors.items():
+            status = monitor.status()
+            st.caption(f"{space} inputs vs {status['source']}: {status['rows']} rows, "
+                       f"{status['rows_out_of_range']} outside the training range")
+            for alert in status['alerts']:
+                st.warning(f"{alert['kind']}: {alert['feature']} = {alert['value']:.2f}")
+            if status['features']:
+                rows = [f"| {name} | {f['psi']:.2f} | {f['mean_shift']:+.2f} | {f['recent_out_of_range']:.0%} |"
+                        for name, f in status['features'].items()]
+                st.markdown("| feature | PSI | mean shift (σ) | out of range |\n|---|---|---|---|\n" + "\n".join(rows))
+        half_life = next(iter(monitors.values())).half_life
+        st.caption(f"Recent rows weigh most (half-life of {half_life} rows). Shared by all sessions of this process.")
+
+
+def render_metrics_panel(metrics):
+    """Collapsible sidebar panel with the stage timings (see metrics.py).
+
+    Ends the rerun's timing, so apps call it last in the sidebar.
+    """
+    profile = metrics.end_rerun()
+    if profile is not None:
+        st.session_state['last_profile'] = profile
+    with st.sidebar.expander("⏱️ Performance"):
+        summary = metrics.summary()
+        if not metrics.enabled:
+            st.caption("Stage timings are off (TUMOR_METRICS=0).")
+        elif summary:
+            rows = [f"| {stage} | {s['count']} | {s['mean_ms']:.1f} | {s['p50_ms']:.1f} | {s['p95_ms']:.1f} | {s['max_ms']:.1f} |"
+                    for stage, s in summary.items()]
+            st.markdown("| stage | n | mean ms | p50 ≤ | p95 ≤ | max ms |\n|---|---|---|---|---|---|\n" + "\n".join(rows))
+            st.caption("Shared by all sessions of this process; p50/p95 are histogram bucket bounds.")
+        if st.button("🔬 Profile next rerun"):
+            st.session_state['profile_next_rerun'] = True
+            st.caption("The next interaction will be profiled.")
+        if 'last_profile' in st.session_state:
+            st.code(st.session_state['last_profile'], language=None)